@@ -0,0 +1,135 @@
+"""
+示例脚本共用的输出工具
+
+在异步示例中，频繁的 print 会在并发步骤之间反复写 stdout。
+这里把输出先放进一个有界的环形缓冲区，由后台任务每 50 毫秒
+合并成一次写入；没有运行中的事件循环时（同步示例）则直接写出。
+异步场景下的实际写入在工作线程中完成，终端较慢时也不会阻塞事件循环。
+
+使用方式：
+    from examples._log import log, aprint, aflush
+    
+    log("🔸 执行步骤")          # 与 print 用法相同
+    await aprint("🔸 执行步骤")  # 立即写出，写入在工作线程中进行
+    await aflush()              # 异步示例结束前刷新剩余内容
+"""
+
+import sys
+import time
+import atexit
+import asyncio
+import threading
+from collections import deque
+from typing import Optional
+
+# 缓冲区最多保留的条目数
+_MAX_ENTRIES = 4096
+
+# 后台刷新间隔（秒）
+_DRAIN_INTERVAL = 0.05
+
+_buffer: deque = deque(maxlen=_MAX_ENTRIES)
+_drain_task: Optional[asyncio.Task] = None
+
+# 保证取出与写入成对完成，工作线程和事件循环线程同时刷新时输出顺序不乱
+_write_lock = threading.Lock()
+
+
+def log(*args, sep: str = " ", end: str = "\n") -> None:
+    """
+    输出一行信息（参数与 print 相同）
+    
+    Args:
+        *args: 要输出的内容
+        sep (str): 各参数之间的分隔符
+        end (str): 结尾字符
+    """
+    
+    _buffer.append((time.monotonic(), sep.join(str(a) for a in args) + end))
+    
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # 同步调用方：直接写出，保证输出及时可见
+        flush()
+        return
+    
+    _ensure_drain_task()
+
+
+async def aprint(*args, sep: str = " ", end: str = "\n") -> None:
+    """
+    异步输出一行信息：连同缓冲区中的内容一起，在工作线程中写到 stdout
+    
+    Args:
+        *args: 要输出的内容
+        sep (str): 各参数之间的分隔符
+        end (str): 结尾字符
+    """
+    
+    _buffer.append((time.monotonic(), sep.join(str(a) for a in args) + end))
+    await _flush_in_thread()
+
+
+def flush() -> None:
+    """把缓冲区中的内容一次性写到 stdout"""
+    
+    with _write_lock:
+        if not _buffer:
+            return
+        
+        parts = []
+        while _buffer:
+            parts.append(_buffer.popleft()[1])
+        
+        sys.stdout.write("".join(parts))
+        sys.stdout.flush()
+
+
+async def aflush() -> None:
+    """停止后台刷新任务并写出剩余内容"""
+    
+    global _drain_task
+    
+    if _drain_task is not None:
+        _drain_task.cancel()
+        try:
+            await _drain_task
+        except asyncio.CancelledError:
+            pass
+        _drain_task = None
+    
+    flush()
+
+
+def _ensure_drain_task() -> None:
+    """在当前事件循环中启动后台刷新任务（如果尚未启动）"""
+    
+    global _drain_task
+    
+    if _drain_task is None or _drain_task.done():
+        _drain_task = asyncio.get_running_loop().create_task(_drain())
+
+
+async def _drain() -> None:
+    """后台任务：定期合并写出缓冲区内容"""
+    
+    while True:
+        await asyncio.sleep(_DRAIN_INTERVAL)
+        if _buffer:
+            await _flush_in_thread()
+
+
+def _flush_in_thread() -> "asyncio.Future":
+    """
+    在默认线程池中执行 flush
+    
+    flush 不读取任何 ContextVar，因此直接交给 run_in_executor，
+    省去 asyncio.to_thread 每次调用时的 copy_context() 和 partial 包装。
+    """
+    
+    return asyncio.get_running_loop().run_in_executor(None, flush)
+
+
+# 进程退出前写出剩余内容
+atexit.register(flush)
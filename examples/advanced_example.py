@@ -14,19 +14,126 @@
 4. 了解如何扩展系统功能
 """
 
+from __future__ import annotations
+
 import sys
 import os
+import importlib
 import json
 import time
-from typing import List, Dict, Any
+import array
+import hashlib
+import pickle
+import shutil
+import asyncio
+from collections import namedtuple
+from typing import Any
+
+import numpy as np
 
 # 添加项目根目录到 Python 路径
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-sys.path.insert(0, project_root)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
 from src.config import config
 from src.mcp_server import mcp_server
-from src.langchain_client import langchain_client
+from examples._log import log, aprint, aflush
+
+# 标题分隔线
+_BAR60 = "\n" + "=" * 60
+_RULE60 = "=" * 60
+
+# Langchain 客户端按需导入：导入示例模块时不触发 LLM 初始化和 MCP 握手
+_langchain_client = None
+
+
+def _client():
+    """获取 Langchain 客户端（首次调用时才导入）"""
+    global _langchain_client
+    if _langchain_client is None:
+        _langchain_client = importlib.import_module("src.langchain_client").langchain_client
+    return _langchain_client
+
+
+# 工作流步骤定义
+# - prompt: 发送给 AI 的消息；若为 (名称, 消息) 元组序列，则这些子步骤合并为一次对话执行
+# - required: 是否为必需步骤
+# - depends_on: 需要先成功完成的步骤名称
+# - stream: 是否边生成边打印回复
+Step = namedtuple("Step", "name prompt required depends_on stream", defaults=(True, (), False))
+
+# 工作流断点文件目录：每个带 workflow_id 的工作流在这里保存已完成步骤的结果
+_CHECKPOINT_DIR = ".workflow_cache"
+
+# 步骤完整结果的落盘目录：内存中只保留摘要，完整结果按需读取
+_RESULTS_DIR = ".workflow_results"
+
+# 内存中保留的输出摘要长度
+_SUMMARY_CHARS = 256
+
+
+def _waves(steps: list[Step]) -> list[list[Step]]:
+    """按 depends_on 对步骤做拓扑排序，返回波次列表（同一波次内的步骤互不依赖）"""
+    
+    names = {step.name for step in steps}
+    for step in steps:
+        unknown = [dep for dep in step.depends_on if dep not in names]
+        if unknown:
+            raise ValueError(f"步骤 '{step.name}' 依赖了未定义的步骤: {', '.join(unknown)}")
+    
+    waves = []
+    done = set()
+    pending = list(steps)
+    while pending:
+        wave = [step for step in pending if all(dep in done for dep in step.depends_on)]
+        if not wave:
+            raise ValueError(f"步骤依赖存在循环: {', '.join(step.name for step in pending)}")
+        waves.append(wave)
+        done.update(step.name for step in wave)
+        pending = [step for step in pending if step.name not in done]
+    
+    return waves
+
+
+def _sub_step_names(step: Step) -> list[str]:
+    """步骤实际记录的名称：单条消息即步骤本身，合并执行时为各个子步骤"""
+    
+    return [step.name] if isinstance(step.prompt, str) else [name for name, _ in step.prompt]
+
+
+async def _print_stream(message: str) -> dict[str, Any]:
+    """流式对话：逐段打印回复，返回完整结果"""
+    
+    result = None
+    async for event in _client().astream_chat(message):
+        if event["event"] == "token":
+            log(event["data"], end="")
+        else:
+            result = event["data"]
+    log()
+    
+    return result
+
+
+async def _timed_stream(message: str) -> tuple:
+    """流式对话并计时，返回 (结果, 首个片段耗时, 总耗时)，耗时单位为纳秒"""
+    
+    start_ns = time.perf_counter_ns()
+    first_token_ns = None
+    result = None
+    
+    async for event in _client().astream_chat(message):
+        if event["event"] == "token":
+            if first_token_ns is None:
+                first_token_ns = time.perf_counter_ns()
+        else:
+            result = event["data"]
+    
+    end_ns = time.perf_counter_ns()
+    ttft_ns = (first_token_ns or end_ns) - start_ns
+    
+    return result, ttft_ns, end_ns - start_ns
 
 
 class AdvancedWorkflow:
@@ -36,292 +143,628 @@ class AdvancedWorkflow:
     这个类展示了如何构建复杂的工作流，包括错误处理和状态管理
     """
     
-    def __init__(self):
-        """初始化工作流"""
-        self.workflow_state = {
-            "current_step": 0,
-            "completed_steps": [],
-            "failed_steps": [],
-            "results": {},
-            "start_time": time.time()
-        }
+    def __init__(self, max_concurrency: int = None, workflow_id: str = None):
+        """
+        初始化工作流
         
-        print("🔄 初始化进阶工作流")
-    
-    def execute_step(self, step_name: str, message: str, required: bool = True) -> bool:
+        Args:
+            max_concurrency (int): 本工作流同时执行的步骤上限，默认使用 config.max_concurrency
+            workflow_id (str): 工作流标识；指定后 run() 会把成功步骤的结果保存到
+                ./.workflow_cache/<workflow_id>-<步骤定义摘要>.json，重新运行时跳过已完成的步骤。
+                步骤定义改变后摘要随之改变，不会误用旧的断点；全部步骤成功后删除断点文件
         """
-        执行工作流步骤
+        self._sem = asyncio.Semaphore(max_concurrency or config.max_concurrency)
+        
+        # 完整结果写到 ./.workflow_results/<id>/<下标>.pkl
+        self.workflow_id = workflow_id or f"{os.getpid()}_{id(self):x}"
+        self.results_dir = os.path.join(_RESULTS_DIR, self.workflow_id)
+        
+        # 断点数据：步骤名称 -> {子步骤名称: 输出}；断点文件在 run() 中按步骤定义确定
+        self._checkpoint_id = workflow_id
+        self._checkpoint_path = None
+        self._checkpoint: dict[str, dict[str, Any]] = {}
+        
+        # 步骤状态按列存储：同一下标对应同一个步骤
+        self.step_names: list[str] = []
+        self.step_ok = bytearray()
+        self.step_required = bytearray()
+        self.step_errors: list[str | None] = []
+        # (是否成功, 输出前 256 个字符)
+        self._result_summaries: list[tuple[bool, str]] = []
+        
+        # 运行计数，摘要直接读取
+        self._ok = 0
+        self._fail = 0
+        self.start_ns = time.perf_counter_ns()
+        
+        log("🔄 初始化进阶工作流")
+    
+    async def aexecute_step(
+        self,
+        step_name: str,
+        message: str,
+        required: bool = True,
+        stream: bool = False
+    ) -> bool:
+        """
+        异步执行工作流步骤
+        
+        通过 achat 调用，多个互不依赖的步骤可以用 asyncio.gather 并发执行
         
         Args:
             step_name (str): 步骤名称
             message (str): 要发送给 AI 的消息
             required (bool): 是否为必需步骤
-            
+            stream (bool): 是否边生成边打印回复（仅适合不与其他步骤并发的步骤）
+        
         Returns:
-            bool: 步骤是否成功执行
+            bool: 工作流是否可以继续（非必需步骤失败时也为 True）
         """
         
-        print(f"\n🔸 执行步骤: {step_name}")
-        print(f"📝 任务: {message}")
+        await aprint(f"\n🔸 执行步骤: {step_name}", f"📝 任务: {message}", sep="\n")
         
         try:
-            # 执行步骤
-            result = langchain_client.chat(message)
-            
-            if result["success"]:
-                print(f"✅ 步骤 '{step_name}' 执行成功")
-                
-                # 记录成功步骤
-                self.workflow_state["completed_steps"].append(step_name)
-                self.workflow_state["results"][step_name] = result
-                
-                return True
-            else:
-                print(f"❌ 步骤 '{step_name}' 执行失败: {result['error']}")
-                
-                # 记录失败步骤
-                self.workflow_state["failed_steps"].append({
-                    "step": step_name,
-                    "error": result["error"],
-                    "required": required
-                })
-                
-                # 如果是必需步骤，返回失败
-                if required:
-                    return False
+            # 执行步骤（受工作流并发上限约束）
+            async with self._sem:
+                if stream:
+                    result = await _print_stream(message)
                 else:
-                    print("⚠️ 非必需步骤失败，继续执行...")
-                    return True
+                    result = await _client().achat(message)
+            return self._record_result(step_name, result, required)
         
         except Exception as e:
-            print(f"❌ 步骤 '{step_name}' 发生异常: {str(e)}")
+            return self._record_exception(step_name, e, required)
+    
+    async def aexecute_batch(self, steps: list[tuple], required: bool = True) -> list[bool]:
+        """
+        通过一次 chat_many 调用批量执行多个互不依赖的步骤
+        
+        Args:
+            steps (list[tuple]): (步骤名称, 消息) 列表
+            required (bool): 这些步骤是否为必需步骤
+        
+        Returns:
+            list[bool]: 每个步骤执行后工作流是否可以继续
+        """
+        
+        for step_name, message in steps:
+            log(f"\n🔸 执行步骤: {step_name}")
+            log(f"📝 任务: {message}")
+        
+        try:
+            results = await _client().chat_many([message for _, message in steps])
+        except Exception as e:
+            return [self._record_exception(step_name, e, required) for step_name, _ in steps]
+        
+        return [
+            self._record_result(step_name, result, required)
+            for (step_name, _), result in zip(steps, results)
+        ]
+    
+    async def aexecute_fused(self, steps: list[tuple], required: bool = True) -> list[bool]:
+        """
+        把多个有先后顺序的步骤合并成一条消息，在一次对话中完成
+        
+        Agent 会在同一次回复中按顺序发出多组 MCP 工具调用，
+        这里再根据返回的 mcp_steps 逐个记录每个步骤的结果。
+        
+        Args:
+            steps (list[tuple]): (步骤名称, 消息) 列表，按执行顺序排列
+            required (bool): 这些步骤是否为必需步骤
+        
+        Returns:
+            list[bool]: 每个步骤执行后工作流是否可以继续
+        """
+        
+        message = "请依次执行以下操作，每个操作调用一次对应的工具：\n" + "\n".join(
+            f"({i}) {step_message}" for i, (_, step_message) in enumerate(steps, 1)
+        )
+        
+        for step_name, _ in steps:
+            log(f"\n🔸 执行步骤: {step_name}")
+        log(f"📝 合并任务: {message}")
+        
+        try:
+            async with self._sem:
+                result = await _client().achat(message)
+        except Exception as e:
+            return [self._record_exception(step_name, e, required) for step_name, _ in steps]
+        
+        if not result["success"]:
+            return [self._record_result(step_name, result, required) for step_name, _ in steps]
+        
+        # 第 i 次工具调用对应第 i 个步骤；缺少的调用视为该步骤未执行
+        mcp_steps = result.get("mcp_steps", [])
+        outcomes = []
+        for i, (step_name, _) in enumerate(steps):
+            if i < len(mcp_steps) and mcp_steps[i]["success"]:
+                step_result = {"success": True, "output": mcp_steps[i]["mcp_result"]}
+            elif i < len(mcp_steps):
+                step_result = {"success": False, "error": mcp_steps[i]["mcp_result"]}
+            else:
+                step_result = {"success": False, "error": "Agent 未执行该步骤"}
+            outcomes.append(self._record_result(step_name, step_result, required))
+        
+        return outcomes
+    
+    async def run(self, steps: list[Step]) -> dict[str, bool]:
+        """
+        按依赖关系执行一组步骤
+        
+        先根据 depends_on 把步骤分成若干波次，同一波次内的步骤并发执行；
+        依赖的步骤未成功时，后续步骤会被跳过。
+        
+        Args:
+            steps (list[Step]): 步骤定义列表
+        
+        Returns:
+            dict[str, bool]: 每个步骤是否成功执行（被跳过的步骤为 False）
+        """
+        
+        outcomes: dict[str, bool] = {}
+        waves = _waves(steps)
+        
+        if self._checkpoint_id:
+            # 断点按步骤定义区分：增删或修改步骤后不会沿用旧断点跳过步骤
+            digest = hashlib.blake2b(repr(steps).encode("utf-8"), digest_size=8).hexdigest()
+            self._checkpoint_path = os.path.join(_CHECKPOINT_DIR, f"{self._checkpoint_id}-{digest}.json")
+            self._checkpoint = {}
+            self._load_checkpoint()
+        
+        for wave in waves:
+            runnable = []
+            for step in wave:
+                if all(outcomes[dep] for dep in step.depends_on):
+                    runnable.append(step)
+                else:
+                    log(f"\n⏭️ 跳过步骤: {step.name}（依赖的步骤未成功）")
+                    outcomes[step.name] = False
+            
+            # 非流式步骤并发执行；流式步骤逐个执行，避免多个回复交错输出
+            concurrent = [step for step in runnable if not step.stream]
+            results = await asyncio.gather(*[self._run_step(step) for step in concurrent])
+            outcomes.update(zip((step.name for step in concurrent), results))
             
-            self.workflow_state["failed_steps"].append({
-                "step": step_name,
-                "error": str(e),
-                "required": required
+            for step in runnable:
+                if step.stream:
+                    outcomes[step.name] = await self._run_step(step)
+        
+        # 全部步骤都已完成时删除断点，下次运行重新执行
+        if self._checkpoint_path and all(step.name in self._checkpoint for step in steps):
+            try:
+                os.remove(self._checkpoint_path)
+            except FileNotFoundError:
+                pass
+        
+        return outcomes
+    
+    async def _run_step(self, step: Step) -> bool:
+        """
+        执行单个步骤定义，返回步骤（及其全部子步骤）是否真正成功
+        
+        非必需步骤失败时 aexecute_* 返回"可以继续"，但依赖它的步骤仍按失败处理，
+        因此这里根据记录的结果判断，而不是使用 aexecute_* 的返回值。
+        """
+        
+        if step.name in self._checkpoint:
+            log(f"\n♻️ 步骤 '{step.name}' 已在之前的运行中完成，跳过")
+            self._restore_step(step)
+            return True
+        
+        if isinstance(step.prompt, str):
+            await self.aexecute_step(step.name, step.prompt, step.required, step.stream)
+        else:
+            await self.aexecute_fused(list(step.prompt), step.required)
+        
+        ok = self._step_succeeded(step)
+        if ok and self._checkpoint_path:
+            self._save_step_checkpoint(step)
+        
+        return ok
+    
+    def _restore_step(self, step: Step) -> None:
+        """把断点中已完成的步骤记为成功（结果带 from_checkpoint 标记），摘要和统计照常计入"""
+        
+        outputs = self._checkpoint[step.name]
+        for name in _sub_step_names(step):
+            self._append_step(name, True, step.required, None, {
+                "success": True,
+                "output": outputs.get(name),
+                "from_checkpoint": True
             })
+    
+    def _step_succeeded(self, step: Step) -> bool:
+        """步骤的每个子步骤最近一次记录是否都成功（同名步骤以最后一次记录为准）"""
+        
+        latest = {name: i for i, name in enumerate(self.step_names)}
+        return all(
+            name in latest and self.step_ok[latest[name]]
+            for name in _sub_step_names(step)
+        )
+    
+    def _load_checkpoint(self) -> None:
+        """读取断点文件（不存在或损坏时从头开始）"""
+        
+        try:
+            with open(self._checkpoint_path, "r", encoding="utf-8") as f:
+                self._checkpoint = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log(f"⚠️ 断点文件无法读取，将从头执行: {str(e)}")
+            return
+        
+        if self._checkpoint:
+            log(f"♻️ 已加载断点，{len(self._checkpoint)} 个步骤无需重新执行")
+    
+    def _save_step_checkpoint(self, step: Step) -> None:
+        """把已成功步骤（及其全部子步骤）的结果写入断点文件"""
+        
+        # 同名步骤以最后一次记录为准
+        latest = {name: i for i, name in enumerate(self.step_names)}
+        self._checkpoint[step.name] = {
+            name: self._load_result(latest[name]).get("output")
+            for name in _sub_step_names(step)
+        }
+        
+        os.makedirs(_CHECKPOINT_DIR, exist_ok=True)
+        tmp_path = self._checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._checkpoint, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._checkpoint_path)
+    
+    def _record_result(self, step_name: str, result: dict[str, Any], required: bool) -> bool:
+        """记录步骤结果，返回工作流是否可以继续"""
+        
+        if result["success"]:
+            log(f"✅ 步骤 '{step_name}' 执行成功")
+            
+            # 记录成功步骤
+            self._append_step(step_name, True, required, None, result)
+            
+            return True
+        else:
+            log(f"❌ 步骤 '{step_name}' 执行失败: {result['error']}")
             
-            return not required
+            # 记录失败步骤
+            self._append_step(step_name, False, required, result["error"], None)
+            
+            # 如果是必需步骤，返回失败
+            if required:
+                return False
+            else:
+                log("⚠️ 非必需步骤失败，继续执行...")
+                return True
+    
+    def _record_exception(self, step_name: str, e: Exception, required: bool) -> bool:
+        """记录步骤异常，返回工作流是否可以继续"""
+        
+        log(f"❌ 步骤 '{step_name}' 发生异常: {str(e)}")
+        
+        self._append_step(step_name, False, required, str(e), None)
+        
+        return not required
+    
+    def _append_step(
+        self,
+        step_name: str,
+        ok: bool,
+        required: bool,
+        error: str | None,
+        result: dict[str, Any] | None
+    ) -> None:
+        """追加一个步骤的记录并更新计数"""
+        
+        self.step_names.append(step_name)
+        self.step_ok.append(ok)
+        self.step_required.append(required)
+        self.step_errors.append(error)
+        
+        output = str(result.get("output", "")) if result else ""
+        self._result_summaries.append((ok, output[:_SUMMARY_CHARS]))
+        
+        if result is not None:
+            os.makedirs(self.results_dir, exist_ok=True)
+            index = len(self.step_names) - 1
+            with open(os.path.join(self.results_dir, f"{index}.pkl"), "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        
+        if ok:
+            self._ok += 1
+        else:
+            self._fail += 1
     
-    def get_workflow_summary(self) -> Dict[str, Any]:
+    def _load_result(self, index: int) -> dict[str, Any] | None:
+        """从磁盘读取第 index 个步骤的完整结果"""
+        
+        try:
+            with open(os.path.join(self.results_dir, f"{index}.pkl"), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+    
+    def get_result(self, step_name: str) -> dict[str, Any] | None:
+        """
+        按需读取步骤的完整结果
+        
+        Args:
+            step_name (str): 步骤名称（同名步骤取最后一次记录）
+            
+        Returns:
+            dict[str, Any] | None: 完整结果；步骤不存在或没有结果时返回 None
+        """
+        
+        for index in range(len(self.step_names) - 1, -1, -1):
+            if self.step_names[index] == step_name:
+                return self._load_result(index)
+        
+        return None
+    
+    def cleanup(self) -> None:
+        """删除落盘的步骤完整结果（工作流结束、不再需要 get_result() 时调用）"""
+        
+        shutil.rmtree(self.results_dir, ignore_errors=True)
+        
+        # 没有其他工作流的结果时连同上级目录一起删除
+        try:
+            os.rmdir(_RESULTS_DIR)
+        except OSError:
+            pass
+    
+    def get_workflow_summary(self) -> dict[str, Any]:
         """获取工作流摘要"""
         
-        total_time = time.time() - self.workflow_state["start_time"]
+        total_time = (time.perf_counter_ns() - self.start_ns) / 1e9
+        total = self._ok + self._fail
         
         return {
-            "total_steps": len(self.workflow_state["completed_steps"]) + len(self.workflow_state["failed_steps"]),
-            "completed_steps": len(self.workflow_state["completed_steps"]),
-            "failed_steps": len(self.workflow_state["failed_steps"]),
-            "success_rate": len(self.workflow_state["completed_steps"]) / max(1, len(self.workflow_state["completed_steps"]) + len(self.workflow_state["failed_steps"])) * 100,
+            "total_steps": total,
+            "completed_steps": self._ok,
+            "failed_steps": self._fail,
+            "success_rate": self._ok / max(1, total) * 100,
             "total_time": total_time,
-            "state": self.workflow_state
+            # 完整结果不随摘要返回，cleanup() 之前可通过 get_result() 或该目录读取
+            "results_dir": self.results_dir
         }
 
 
-def workflow_1_data_analysis():
+def workflow_1_steps() -> list[Step]:
+    """工作流 1 的步骤定义"""
+    
+    return [
+        # 步骤 1-4：创建数据、计算总销量、计算总收入、生成报告
+        # 合并为一次对话，由 Agent 在同一轮中依次调用工具，省去 3 次 LLM 往返
+        Step("数据分析", (
+            (
+                "创建数据",
+                "创建一个名为 sales_data.txt 的文件，内容包含以下销售数据："
+                "产品A: 销量100, 价格50, 总收入5000；"
+                "产品B: 销量150, 价格30, 总收入4500；"
+                "产品C: 销量80, 价格75, 总收入6000"
+            ),
+            ("计算总销量", "计算总销量：100 + 150 + 80"),
+            ("计算总收入", "计算总收入：5000 + 4500 + 6000"),
+            (
+                "生成报告",
+                "创建一个名为 sales_report.txt 的文件，包含销售分析报告。"
+                "报告应该包括：总销量330件，总收入15500元，平均价格约47元"
+            )
+        )),
+        # 步骤 5：生成时间戳（可选步骤，依赖报告文件）
+        Step(
+            "添加时间戳",
+            "请获取当前时间并将其添加到报告文件的末尾",
+            required=False,
+            depends_on=("数据分析",)
+        )
+    ]
+
+
+async def workflow_1_data_analysis():
     """工作流 1：数据分析和报告生成"""
     
-    print("\n" + "="*60)
-    print("📊 工作流 1：数据分析和报告生成")
-    print("="*60)
-    print("🎯 目标：生成销售数据分析报告")
+    log(_BAR60)
+    log("📊 工作流 1：数据分析和报告生成")
+    log(_RULE60)
+    log("🎯 目标：生成销售数据分析报告")
     
-    workflow = AdvancedWorkflow()
-    
-    # 步骤 1：创建示例数据
-    success = workflow.execute_step(
-        "创建数据",
-        "请创建一个名为 sales_data.txt 的文件，内容包含以下销售数据：\n"
-        "产品A: 销量100, 价格50, 总收入5000\n"
-        "产品B: 销量150, 价格30, 总收入4500\n"
-        "产品C: 销量80, 价格75, 总收入6000"
-    )
-    
-    if not success:
-        print("❌ 数据创建失败，工作流终止")
-        return
-    
-    # 步骤 2：计算总销量
-    success = workflow.execute_step(
-        "计算总销量",
-        "请计算总销量：100 + 150 + 80"
-    )
-    
-    # 步骤 3：计算总收入
-    success = workflow.execute_step(
-        "计算总收入",
-        "请计算总收入：5000 + 4500 + 6000"
-    )
-    
-    # 步骤 4：生成分析报告
-    success = workflow.execute_step(
-        "生成报告",
-        "请创建一个名为 sales_report.txt 的文件，包含销售分析报告。"
-        "报告应该包括：总销量330件，总收入15500元，平均价格约47元"
-    )
+    # 成功步骤保存到断点文件：重新运行时不再重复调用 LLM
+    workflow = AdvancedWorkflow(workflow_id="workflow_1")
+    try:
+        outcomes = await workflow.run(workflow_1_steps())
+    finally:
+        workflow.cleanup()
     
-    # 步骤 5：生成时间戳（可选步骤）
-    workflow.execute_step(
-        "添加时间戳",
-        "请获取当前时间并将其添加到报告文件的末尾",
-        required=False
-    )
+    if not outcomes["数据分析"]:
+        log("❌ 数据分析步骤失败，已跳过后续步骤")
     
     # 显示工作流摘要
     summary = workflow.get_workflow_summary()
-    print(f"\n📋 工作流摘要:")
-    print(f"   总步骤: {summary['total_steps']}")
-    print(f"   成功步骤: {summary['completed_steps']}")
-    print(f"   失败步骤: {summary['failed_steps']}")
-    print(f"   成功率: {summary['success_rate']:.1f}%")
-    print(f"   总耗时: {summary['total_time']:.2f}秒")
+    log(f"\n📋 工作流摘要:")
+    log(f"   总步骤: {summary['total_steps']}")
+    log(f"   成功步骤: {summary['completed_steps']}")
+    log(f"   失败步骤: {summary['failed_steps']}")
+    log(f"   成功率: {summary['success_rate']:.1f}%")
+    log(f"   总耗时: {summary['total_time']:.2f}秒")
+
 
+# 工作流 2 要创建的文件列表
+_FILES_TO_CREATE = [
+    ("note1.txt", "这是第一个笔记文件"),
+    ("note2.txt", "这是第二个笔记文件"),
+    ("data.txt", "这是数据文件"),
+    ("config.txt", "这是配置文件"),
+    ("log.txt", "这是日志文件")
+]
 
-def workflow_2_file_management():
+# 每个文件对应的子步骤名称
+_FILE_STEP_NAMES = [f"创建文件{i}" for i in range(1, len(_FILES_TO_CREATE) + 1)]
+
+
+def workflow_2_steps() -> list[Step]:
+    """工作流 2 的步骤定义"""
+    
+    return [
+        # 所有文件在一次对话中创建：Agent 在同一轮回复里发出 5 次 write_file 调用，
+        # 每个文件是否创建成功根据对应的 mcp_steps 记录；文件创建是非必需步骤，
+        # 失败只记录不报错，但有文件未创建成功时依赖它的后续步骤会被跳过
+        Step("创建文件", tuple(
+            (step_name, f"请创建文件 {filename}，内容为：{content}")
+            for step_name, (filename, content) in zip(_FILE_STEP_NAMES, _FILES_TO_CREATE)
+        ), required=False),
+        Step(
+            "列出文件",
+            "请列出工作目录中的所有文件，并统计文件数量",
+            depends_on=("创建文件",),
+            stream=True
+        ),
+        Step(
+            "创建清单",
+            "请创建一个名为 file_inventory.txt 的文件，"
+            "列出所有刚才创建的文件及其用途",
+            depends_on=("列出文件",),
+            stream=True
+        ),
+        Step(
+            "统计分析",
+            "请计算创建的文件总数（应该是5个文件加上清单文件）",
+            depends_on=("创建清单",),
+            stream=True
+        )
+    ]
+
+
+async def workflow_2_file_management():
     """工作流 2：文件管理和整理"""
     
-    print("\n" + "="*60)
-    print("📁 工作流 2：文件管理和整理")
-    print("="*60)
-    print("🎯 目标：创建和整理多个测试文件")
+    log(_BAR60)
+    log("📁 工作流 2：文件管理和整理")
+    log(_RULE60)
+    log("🎯 目标：创建和整理多个测试文件")
     
     workflow = AdvancedWorkflow()
-    
-    # 要创建的文件列表
-    files_to_create = [
-        ("note1.txt", "这是第一个笔记文件"),
-        ("note2.txt", "这是第二个笔记文件"),
-        ("data.txt", "这是数据文件"),
-        ("config.txt", "这是配置文件"),
-        ("log.txt", "这是日志文件")
-    ]
-    
-    # 批量创建文件
-    for i, (filename, content) in enumerate(files_to_create, 1):
-        success = workflow.execute_step(
-            f"创建文件{i}",
-            f"请创建文件 {filename}，内容为：{content}",
-            required=False  # 单个文件创建失败不影响整体流程
-        )
-    
-    # 列出所有文件
-    workflow.execute_step(
-        "列出文件",
-        "请列出工作目录中的所有文件，并统计文件数量"
-    )
-    
-    # 创建文件清单
-    workflow.execute_step(
-        "创建清单",
-        "请创建一个名为 file_inventory.txt 的文件，"
-        "列出所有刚才创建的文件及其用途"
-    )
-    
-    # 计算文件统计
-    workflow.execute_step(
-        "统计分析",
-        "请计算创建的文件总数（应该是5个文件加上清单文件）"
+    try:
+        await workflow.run(workflow_2_steps())
+    finally:
+        workflow.cleanup()
+    
+    # 合并执行后步骤数不再固定，直接统计成功的文件创建子步骤
+    file_steps = set(_FILE_STEP_NAMES)
+    created = sum(
+        1 for name, ok in zip(workflow.step_names, workflow.step_ok)
+        if ok and name in file_steps
     )
     
     # 显示工作流摘要
     summary = workflow.get_workflow_summary()
-    print(f"\n📋 工作流摘要:")
-    print(f"   成功创建文件: {summary['completed_steps'] - 1}")  # 减去列表步骤
-    print(f"   成功率: {summary['success_rate']:.1f}%")
+    log(f"\n📋 工作流摘要:")
+    log(f"   成功创建文件: {created}")
+    log(f"   成功率: {summary['success_rate']:.1f}%")
+
 
+# 斐波那契数列前几项的计算任务
+_FIB_CALCULATIONS = [
+    ("第1项", "计算斐波那契数列第1项：1"),
+    ("第2项", "计算斐波那契数列第2项：1"),
+    ("第3项", "计算：1 + 1"),
+    ("第4项", "计算：1 + 2"),
+    ("第5项", "计算：2 + 3"),
+    ("第6项", "计算：3 + 5"),
+    ("第7项", "计算：5 + 8"),
+    ("第8项", "计算：8 + 13")
+]
 
-def workflow_3_mathematical_sequence():
+
+def workflow_3_steps() -> list[Step]:
+    """工作流 3 的步骤定义"""
+    
+    # 每一项的提示词都直接写明了操作数，彼此没有依赖，全部在同一波次并发执行
+    return [
+        Step(step_name, f"请{calculation}", required=False)
+        for step_name, calculation in _FIB_CALCULATIONS
+    ] + [
+        Step(
+            "序列分析",
+            "请创建一个名为 fibonacci_analysis.txt 的文件，"
+            "包含斐波那契数列的前8项：1, 1, 2, 3, 5, 8, 13, 21，"
+            "并说明这个数列的特点"
+        ),
+        Step(
+            "黄金比例",
+            "请计算 21/13 的值，这是斐波那契数列相邻项比值的近似黄金比例"
+        )
+    ]
+
+
+async def workflow_3_mathematical_sequence():
     """工作流 3：数学序列计算"""
     
-    print("\n" + "="*60)
-    print("🧮 工作流 3：数学序列计算")
-    print("="*60)
-    print("🎯 目标：计算斐波那契数列并分析")
+    log(_BAR60)
+    log("🧮 工作流 3：数学序列计算")
+    log(_RULE60)
+    log("🎯 目标：计算斐波那契数列并分析")
     
     workflow = AdvancedWorkflow()
-    
-    # 计算斐波那契数列的前几项
-    fib_calculations = [
-        ("第1项", "计算斐波那契数列第1项：1"),
-        ("第2项", "计算斐波那契数列第2项：1"),
-        ("第3项", "计算：1 + 1"),
-        ("第4项", "计算：1 + 2"),
-        ("第5项", "计算：2 + 3"),
-        ("第6项", "计算：3 + 5"),
-        ("第7项", "计算：5 + 8"),
-        ("第8项", "计算：8 + 13")
-    ]
-    
-    results = []
-    for step_name, calculation in fib_calculations:
-        success = workflow.execute_step(
-            step_name,
-            f"请{calculation}",
-            required=False
-        )
-        
-        if success:
-            # 这里可以提取计算结果，但为了简化，我们只记录成功
-            results.append(step_name)
-    
-    # 生成序列分析
-    workflow.execute_step(
-        "序列分析",
-        "请创建一个名为 fibonacci_analysis.txt 的文件，"
-        "包含斐波那契数列的前8项：1, 1, 2, 3, 5, 8, 13, 21，"
-        "并说明这个数列的特点"
-    )
-    
-    # 计算黄金比例近似值
-    workflow.execute_step(
-        "黄金比例",
-        "请计算 21/13 的值，这是斐波那契数列相邻项比值的近似黄金比例"
+    try:
+        await workflow.run(workflow_3_steps())
+    finally:
+        workflow.cleanup()
+    
+    # 这里可以提取计算结果，但为了简化，我们只统计成功的计算步骤
+    fib_names = {step_name for step_name, _ in _FIB_CALCULATIONS}
+    succeeded = sum(
+        1 for name, ok in zip(workflow.step_names, workflow.step_ok)
+        if ok and name in fib_names
     )
     
     # 显示摘要
     summary = workflow.get_workflow_summary()
-    print(f"\n📋 数学工作流摘要:")
-    print(f"   计算步骤: {len(fib_calculations)}")
-    print(f"   成功计算: {len(results)}")
-    print(f"   计算成功率: {len(results)/len(fib_calculations)*100:.1f}%")
+    log(f"\n📋 数学工作流摘要:")
+    log(f"   计算步骤: {len(_FIB_CALCULATIONS)}")
+    log(f"   成功计算: {succeeded}")
+    log(f"   计算成功率: {succeeded/len(_FIB_CALCULATIONS)*100:.1f}%")
 
 
-def demonstrate_error_handling():
+async def demonstrate_error_handling():
     """演示错误处理"""
     
-    print("\n" + "="*60)
-    print("🚨 错误处理演示")
-    print("="*60)
-    print("🎯 目标：演示系统如何处理各种错误情况")
+    log(_BAR60)
+    log("🚨 错误处理演示")
+    log(_RULE60)
+    log("🎯 目标：演示系统如何处理各种错误情况")
+    
+    # 测试文件访问错误和计算错误（互不依赖，并发执行）
+    file_result, calc_result = await asyncio.gather(
+        _client().achat("请读取一个不存在的文件：nonexistent.txt"),
+        _client().achat("请计算一个无效的表达式：abc + def")
+    )
     
-    # 测试文件访问错误
-    print("\n🔸 测试文件访问错误")
-    result = langchain_client.chat("请读取一个不存在的文件：nonexistent.txt")
-    print(f"结果: {'成功' if result['success'] else '失败（预期）'}")
+    log("\n🔸 测试文件访问错误")
+    log(f"结果: {'成功' if file_result['success'] else '失败（预期）'}")
     
-    # 测试计算错误
-    print("\n🔸 测试计算错误")
-    result = langchain_client.chat("请计算一个无效的表达式：abc + def")
-    print(f"结果: {'成功' if result['success'] else '失败（预期）'}")
+    log("\n🔸 测试计算错误")
+    log(f"结果: {'成功' if calc_result['success'] else '失败（预期）'}")
     
-    # 测试恢复策略
-    print("\n🔸 测试错误恢复")
-    result = langchain_client.chat("上一个计算失败了，请改为计算简单的加法：2 + 3")
-    print(f"恢复结果: {'成功' if result['success'] else '失败'}")
+    # 测试恢复策略（依赖上一步的失败，需在其后执行）
+    log("\n🔸 测试错误恢复")
+    result = await _client().achat("上一个计算失败了，请改为计算简单的加法：2 + 3")
+    log(f"恢复结果: {'成功' if result['success'] else '失败'}")
     
-    print("\n💡 错误处理演示完成。系统能够：")
-    print("   • 优雅地处理文件不存在错误")
-    print("   • 识别并报告无效的计算表达式")
-    print("   • 在错误后继续正常工作")
+    log("\n💡 错误处理演示完成。系统能够：")
+    log("   • 优雅地处理文件不存在错误")
+    log("   • 识别并报告无效的计算表达式")
+    log("   • 在错误后继续正常工作")
 
 
-def performance_benchmark():
+async def performance_benchmark():
     """性能基准测试"""
     
-    print("\n" + "="*60)
-    print("⚡ 性能基准测试")
-    print("="*60)
+    log(_BAR60)
+    log("⚡ 性能基准测试")
+    log(_RULE60)
+    
+    # 预热：首次请求要承担建立连接、握手等一次性开销，不计入测量结果
+    await _client().achat("warmup")
     
     # 测试不同类型操作的性能
     operations = [
@@ -333,79 +776,103 @@ def performance_benchmark():
         ("随机数生成", "生成一个 1-100 的随机数")
     ]
     
+    # 文件读取依赖文件创建，其余操作互不依赖
+    dependent_ops = {"文件读取"}
+    independent = [op for op in operations if op[0] not in dependent_ops]
+    dependent = [op for op in operations if op[0] in dependent_ops]
+    
     performance_results = []
+    # 成功操作的耗时（纳秒）与名称，按相同下标对应
+    success_times = array.array('q')
+    success_names = []
+    for batch in (independent, dependent):
+        timed = await asyncio.gather(*[_timed_stream(message) for _, message in batch])
+        for (op_name, _), (result, ttft_ns, elapsed_ns) in zip(batch, timed):
+            performance_results.append({
+                "operation": op_name,
+                "success": result["success"],
+                "ttft_ms": ttft_ns / 1_000_000,
+                "execution_ms": elapsed_ns / 1_000_000
+            })
+            if result["success"]:
+                success_times.append(elapsed_ns)
+                success_names.append(op_name)
     
-    for op_name, message in operations:
-        print(f"\n🔸 测试: {op_name}")
-        
-        start_time = time.time()
-        result = langchain_client.chat(message)
-        end_time = time.time()
-        
-        execution_time = end_time - start_time
-        performance_results.append({
-            "operation": op_name,
-            "success": result["success"],
-            "time": execution_time
-        })
-        
-        print(f"   耗时: {execution_time:.3f}秒")
-        print(f"   状态: {'成功' if result['success'] else '失败'}")
+    for r in performance_results:
+        log(f"\n🔸 测试: {r['operation']}")
+        log(f"   首个片段: {r['ttft_ms'] / 1000:.3f}秒")
+        log(f"   耗时: {r['execution_ms'] / 1000:.3f}秒")
+        log(f"   状态: {'成功' if r['success'] else '失败'}")
     
     # 分析性能结果
-    print(f"\n📊 性能分析:")
-    successful_ops = [r for r in performance_results if r["success"]]
-    if successful_ops:
-        avg_time = sum(r["time"] for r in successful_ops) / len(successful_ops)
-        fastest = min(successful_ops, key=lambda x: x["time"])
-        slowest = max(successful_ops, key=lambda x: x["time"])
+    log(f"\n📊 性能分析:")
+    if success_names:
+        times = np.frombuffer(success_times, dtype=np.int64) / 1e9
+        avg_time = times.mean()
+        i_min = int(times.argmin())
+        i_max = int(times.argmax())
+        success_count = len(success_names)
         
-        print(f"   平均响应时间: {avg_time:.3f}秒")
-        print(f"   最快操作: {fastest['operation']} ({fastest['time']:.3f}秒)")
-        print(f"   最慢操作: {slowest['operation']} ({slowest['time']:.3f}秒)")
-        print(f"   成功率: {len(successful_ops)}/{len(performance_results)} ({len(successful_ops)/len(performance_results)*100:.1f}%)")
+        log(f"   平均响应时间: {avg_time:.3f}秒")
+        log(f"   最快操作: {success_names[i_min]} ({times[i_min]:.3f}秒)")
+        log(f"   最慢操作: {success_names[i_max]} ({times[i_max]:.3f}秒)")
+        log(f"   成功率: {success_count}/{len(performance_results)} ({success_count/len(performance_results)*100:.1f}%)")
 
 
-def main():
-    """主函数：运行所有进阶示例"""
+async def _run_all():
+    """依次运行所有进阶示例（每个示例内部并发执行互不依赖的步骤）"""
     
-    print("🚀 Langchain + MCP Server 进阶示例")
-    print("="*60)
-    print("📚 这个示例展示复杂工作流、错误处理和性能测试")
-    print("💡 观察系统如何处理复杂任务和错误情况")
-    print("="*60)
+    log("🚀 Langchain + MCP Server 进阶示例")
+    log(_RULE60)
+    log("📚 这个示例展示复杂工作流、错误处理和性能测试")
+    log("💡 观察系统如何处理复杂任务和错误情况")
+    log(_RULE60)
     
     try:
+        # 异步对话需要先完成 MCP 握手
+        if not _client().mcp_initialized:
+            await _client().initialize()
+        
         # 运行复杂工作流
-        workflow_1_data_analysis()
-        workflow_2_file_management()
-        workflow_3_mathematical_sequence()
+        await workflow_1_data_analysis()
+        await workflow_2_file_management()
+        await workflow_3_mathematical_sequence()
         
         # 演示错误处理
-        demonstrate_error_handling()
+        await demonstrate_error_handling()
         
         # 性能基准测试
-        performance_benchmark()
+        await performance_benchmark()
         
         # 最终统计
-        print("\n" + "="*60)
-        print("📊 进阶示例总结")
-        print("="*60)
-        
-        final_stats = langchain_client.get_usage_stats()
-        print(f"本次运行工具调用总数: {final_stats['total_calls']}")
-        print(f"最常用工具: {final_stats.get('most_used_tool', '无')}")
+        log(_BAR60)
+        log("📊 进阶示例总结")
+        log(_RULE60)
         
-        print("\n✅ 所有进阶示例运行完成！")
-        print("💡 从这些示例中你应该学到：")
-        print("   • 如何设计复杂的多步骤工作流")
-        print("   • 系统的错误处理和恢复能力")
-        print("   • 不同操作的性能特征")
-        print("   • 批量操作和状态管理的方法")
+        call_stats = _client().get_server_stats()["call_stats"]
+        total_calls = sum(call_stats.values())
+        log(f"本次运行工具调用总数: {total_calls}")
+        log(f"最常用工具: {max(call_stats, key=call_stats.get) if total_calls else '无'}")
         
+        log("\n✅ 所有进阶示例运行完成！")
+        log("💡 从这些示例中你应该学到：")
+        log("   • 如何设计复杂的多步骤工作流")
+        log("   • 系统的错误处理和恢复能力")
+        log("   • 不同操作的性能特征")
+        log("   • 批量操作和状态管理的方法")
+    
     except Exception as e:
-        print(f"\n❌ 进阶示例运行失败: {str(e)}")
-        print("💡 请检查系统状态和配置")
+        log(f"\n❌ 进阶示例运行失败: {str(e)}")
+        log("💡 请检查系统状态和配置")
+    
+    finally:
+        await aflush()
+
+
+def main():
+    """主函数：运行所有进阶示例"""
+    
+    asyncio.run(_run_all())
 
 
 if __name__ == "__main__":
@@ -7,12 +7,47 @@
 
 import sys
 import os
+import atexit
+import asyncio
 
 # 确保项目根目录在 Python 路径中
 project_root = os.path.dirname(os.path.abspath(__file__))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+# 分隔线
+_BAR50 = "\n" + "=" * 50
+_RULE50 = "=" * 50
+_RULE40 = "=" * 40
+
+# 菜单输入的历史记录文件
+HISTORY_FILE = os.path.expanduser("~/.mcp_menu_history")
+
+# 启用 readline：input() 支持行编辑、上下键历史和 Tab 补全（Windows 上没有此模块）
+try:
+    import readline
+    
+    readline.parse_and_bind("tab: complete")
+    readline.set_history_length(1000)
+    try:
+        readline.read_history_file(HISTORY_FILE)
+    except OSError:
+        pass
+    atexit.register(readline.write_history_file, HISTORY_FILE)
+except ImportError:
+    pass
+
+
+async def _run_tool_checks(mcp_server):
+    """初始化 MCP Server，并同时执行时间工具和计算工具（两者互不依赖）"""
+    
+    await mcp_server.handle_request({"jsonrpc": "2.0", "id": 0, "method": "initialize", "params": {}})
+    return await asyncio.gather(
+        mcp_server.execute_tool_fast("get_current_time", {}),
+        mcp_server.execute_tool_fast("calculate", {"expression": "2 + 2"}),
+        return_exceptions=True
+    )
+
 
 def quick_test():
     """快速功能测试"""
@@ -26,7 +61,7 @@ def quick_test():
         
         # 测试 MCP Server
         from src.mcp_server import mcp_server
-        print(f"✅ MCP Server 初始化成功，注册了 {len(mcp_server.tools)} 个工具")
+        print(f"✅ MCP Server 初始化成功，注册了 {mcp_server.get_server_stats()['tools']['total']} 个工具")
         
         # 测试 Langchain 客户端
         from src.langchain_client import langchain_client
@@ -35,19 +70,20 @@ def quick_test():
         # 简单功能测试
         print("\n🔍 执行简单功能测试...")
         
+        # 工具执行失败时 gather 返回异常对象，结果按提交顺序排列
+        time_result, calc_result = asyncio.run(_run_tool_checks(mcp_server))
+        
         # 测试时间工具
-        result = mcp_server.execute_tool("get_current_time", {})
-        if result["success"]:
+        if not isinstance(time_result, Exception):
             print("✅ 时间工具测试通过")
         else:
-            print(f"❌ 时间工具测试失败: {result['error']}")
+            print(f"❌ 时间工具测试失败: {time_result}")
         
         # 测试计算工具
-        result = mcp_server.execute_tool("calculate", {"expression": "2 + 2"})
-        if result["success"]:
+        if not isinstance(calc_result, Exception) and calc_result["result"] == 4:
             print("✅ 计算工具测试通过")
         else:
-            print(f"❌ 计算工具测试失败: {result['error']}")
+            print(f"❌ 计算工具测试失败: {calc_result}")
         
         print("\n🎉 快速测试完成！系统运行正常。")
         return True
@@ -60,9 +96,9 @@ def quick_test():
 def show_menu():
     """显示菜单"""
     
-    print("\n" + "="*50)
+    print(_BAR50)
     print("🎯 Langchain + MCP Server 项目启动器")
-    print("="*50)
+    print(_RULE50)
     print("请选择要执行的操作：")
     print()
     print("1. 🧪 快速功能测试")
@@ -73,7 +109,7 @@ def show_menu():
     print("6. 📊 查看系统状态")
     print("7. ❓ 查看帮助信息")
     print("8. 🚪 退出程序")
-    print("="*50)
+    print(_RULE50)
 
 
 def run_examples():
@@ -129,68 +165,84 @@ def show_system_status():
     """显示系统状态"""
     
     print("\n📊 系统状态信息")
-    print("="*40)
+    print(_RULE40)
+    
+    # 状态信息先收集，最后一次输出
+    lines = []
     
     try:
+        # 状态页只需要配置和 MCP Server，不导入 Langchain 客户端（避免初始化 LLM）
         from src.config import config
         from src.mcp_server import mcp_server
-        from src.langchain_client import langchain_client
         
         # 配置信息
-        print(f"🌐 API 地址: {config.api_base_url}")
-        print(f"🤖 模型名称: {config.model_name}")
-        print(f"📁 工作目录: {config.work_directory}")
-        print(f"📊 日志级别: {config.log_level}")
+        lines.append(f"🌐 API 地址: {config.api_base_url}")
+        lines.append(f"🤖 模型名称: {config.model_name}")
+        lines.append(f"📁 工作目录: {config.work_directory}")
+        lines.append(f"📊 日志级别: {config.log_level}")
         
         # 工具信息
-        print(f"\n🔧 MCP Server 工具: {len(mcp_server.tools)} 个")
+        lines.append(f"\n🔧 MCP Server 工具: {len(mcp_server.tools)} 个")
         for tool_name in mcp_server.tools.keys():
-            print(f"   • {tool_name}")
+            lines.append(f"   • {tool_name}")
         
         # 使用统计
         stats = mcp_server.get_usage_stats()
-        print(f"\n📈 使用统计:")
-        print(f"   总调用次数: {stats['total_calls']}")
-        print(f"   最常用工具: {stats.get('most_used_tool', '无')}")
-        
-        # 检查文件系统
-        workspace_files = os.listdir(config.work_directory)
-        print(f"\n📁 工作目录文件: {len(workspace_files)} 个")
-        for filename in workspace_files[:5]:  # 只显示前5个
-            print(f"   • {filename}")
+        lines.append(f"\n📈 使用统计:")
+        lines.append(f"   总调用次数: {stats['total_calls']}")
+        lines.append(f"   最常用工具: {stats.get('most_used_tool', '无')}")
+        
+        # 检查文件系统（scandir 的目录项自带类型信息，无需逐个 stat 判断文件/目录）
+        with os.scandir(config.work_directory) as it:
+            workspace_files = list(it)
+        lines.append(f"\n📁 工作目录文件: {len(workspace_files)} 个")
+        for entry in workspace_files[:5]:  # 只显示前5个
+            if entry.is_file():
+                lines.append(f"   • {entry.name} ({entry.stat().st_size} 字节)")
+            else:
+                lines.append(f"   • {entry.name}/")
         if len(workspace_files) > 5:
-            print(f"   ... 还有 {len(workspace_files) - 5} 个文件")
+            lines.append(f"   ... 还有 {len(workspace_files) - 5} 个文件")
+        
+        print("\n".join(lines))
         
     except Exception as e:
-        print(f"❌ 获取状态失败: {str(e)}")
+        lines.append(f"❌ 获取状态失败: {str(e)}")
+        print("\n".join(lines))
+
+
+# 帮助信息（一次写出）
+_HELP_TEXT = "\n".join((
+    "\n❓ 帮助信息",
+    _RULE40,
+    "📚 项目结构:",
+    "   • src/          - 源代码目录",
+    "   • examples/     - 示例代码目录",
+    "   • workspace/    - 工作文件目录",
+    "   • README.md     - 项目说明",
+    "   • tutorial.md   - 详细教程",
+    "",
+    "🚀 快速开始:",
+    "   1. 先运行快速测试确保系统正常",
+    "   2. 查看基础示例了解基本功能",
+    "   3. 尝试交互式对话体验完整功能",
+    "   4. 阅读教程了解更多详情",
+    "",
+    "🔧 配置文件:",
+    "   • .env          - 环境变量配置",
+    "   • .env.example  - 配置模板",
+    "",
+    "📖 更多信息:",
+    "   • 查看 README.md 了解项目概述",
+    "   • 查看 tutorial.md 学习详细教程",
+    "   • 查看示例代码了解具体用法"
+)) + "\n"
 
 
 def show_help():
     """显示帮助信息"""
     
-    print("\n❓ 帮助信息")
-    print("="*40)
-    print("📚 项目结构:")
-    print("   • src/          - 源代码目录")
-    print("   • examples/     - 示例代码目录")
-    print("   • workspace/    - 工作文件目录")
-    print("   • README.md     - 项目说明")
-    print("   • tutorial.md   - 详细教程")
-    print()
-    print("🚀 快速开始:")
-    print("   1. 先运行快速测试确保系统正常")
-    print("   2. 查看基础示例了解基本功能")
-    print("   3. 尝试交互式对话体验完整功能")
-    print("   4. 阅读教程了解更多详情")
-    print()
-    print("🔧 配置文件:")
-    print("   • .env          - 环境变量配置")
-    print("   • .env.example  - 配置模板")
-    print()
-    print("📖 更多信息:")
-    print("   • 查看 README.md 了解项目概述")
-    print("   • 查看 tutorial.md 学习详细教程")
-    print("   • 查看示例代码了解具体用法")
+    sys.stdout.write(_HELP_TEXT)
 
 
 def main():
@@ -8,105 +8,137 @@
 """
 
 import os
-from typing import List, Optional
+import time
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
 # 加载环境变量文件
 load_dotenv()
 
+logger = logging.getLogger(__name__)
 
+
+def _env_list(name: str, default: str) -> List[str]:
+    """读取逗号分隔的环境变量，返回去掉首尾空白的列表"""
+    return [item.strip() for item in os.getenv(name, default).split(",")]
+
+
+@dataclass(slots=True, frozen=True)
 class Config:
     """
     配置类：管理所有应用程序配置
     
-    这个类将所有配置集中管理，便于维护和修改
+    这个类将所有配置集中管理，便于维护和修改。
+    各字段在实例化时从环境变量读取；实例创建后只读。
     """
     
-    def __init__(self):
-        """初始化配置，从环境变量读取设置"""
-        
-        # ===========================================
-        # LLM API 相关配置
-        # ===========================================
-        
-        # API 基础 URL
-        self.api_base_url: str = os.getenv(
-            "API_BASE_URL", 
-            "http://xx.xx.xx.xxx:xxxx/v1"
-        )
-        
-        # 使用的模型名称
-        self.model_name: str = os.getenv(
-            "MODEL_NAME", 
-            "DeepSeek-V3-0324-HSW"
-        )
-        
-        # API 请求超时时间（秒）
-        self.api_timeout: int = int(os.getenv("API_TIMEOUT", "30"))
-        
-        # API 密钥（可选）
-        self.api_key: Optional[str] = os.getenv("API_KEY")
-        
-        # ===========================================
-        # MCP Server 相关配置
-        # ===========================================
-        
-        # MCP Server 监听地址
-        self.mcp_server_host: str = os.getenv("MCP_SERVER_HOST", "localhost")
-        
-        # MCP Server 监听端口
-        self.mcp_server_port: int = int(os.getenv("MCP_SERVER_PORT", "8080"))
-        
-        # MCP Server 日志级别
-        self.mcp_log_level: str = os.getenv("MCP_LOG_LEVEL", "INFO")
-        
-        # ===========================================
-        # 应用程序配置
-        # ===========================================
-        
-        # 应用日志级别
-        self.log_level: str = os.getenv("LOG_LEVEL", "INFO")
-        
-        # 工作目录（用于文件操作）
-        self.work_directory: str = os.getenv("WORK_DIRECTORY", "./workspace")
-        
-        # 最大文件大小（字节）
-        self.max_file_size: int = int(os.getenv("MAX_FILE_SIZE", "1048576"))  # 1MB
-        
-        # ===========================================
-        # 安全配置
-        # ===========================================
+    # ===========================================
+    # LLM API 相关配置
+    # ===========================================
+    
+    # API 基础 URL
+    api_base_url: str = field(default_factory=lambda: os.getenv(
+        "API_BASE_URL", 
+        "http://xx.xx.xx.xxx:xxxx/v1"
+    ))
+    
+    # 使用的模型名称
+    model_name: str = field(default_factory=lambda: os.getenv(
+        "MODEL_NAME", 
+        "DeepSeek-V3-0324-HSW"
+    ))
+    
+    # API 请求超时时间（秒）
+    api_timeout: int = field(default_factory=lambda: int(os.getenv("API_TIMEOUT", "30")))
+    
+    # API 密钥（可选）
+    api_key: Optional[str] = field(default_factory=lambda: os.getenv("API_KEY"))
+    
+    # ===========================================
+    # MCP Server 相关配置
+    # ===========================================
+    
+    # MCP Server 监听地址
+    mcp_server_host: str = field(default_factory=lambda: os.getenv("MCP_SERVER_HOST", "localhost"))
+    
+    # MCP Server 监听端口
+    mcp_server_port: int = field(default_factory=lambda: int(os.getenv("MCP_SERVER_PORT", "8080")))
+    
+    # MCP Server 日志级别
+    mcp_log_level: str = field(default_factory=lambda: os.getenv("MCP_LOG_LEVEL", "INFO"))
+    
+    # ===========================================
+    # 应用程序配置
+    # ===========================================
+    
+    # 应用日志级别
+    log_level: str = field(default_factory=lambda: os.getenv("LOG_LEVEL", "INFO"))
+    
+    # 工作目录（用于文件操作）
+    work_directory: str = field(default_factory=lambda: os.getenv("WORK_DIRECTORY", "./workspace"))
+    
+    # 最大文件大小（字节）
+    max_file_size: int = field(default_factory=lambda: int(os.getenv("MAX_FILE_SIZE", "1048576")))  # 1MB
+    
+    # ===========================================
+    # 安全配置
+    # ===========================================
+    
+    # 允许的文件扩展名
+    allowed_file_extensions: List[str] = field(default_factory=lambda: _env_list(
+        "ALLOWED_FILE_EXTENSIONS", 
+        ".txt,.md,.json,.csv,.log"
+    ))
+    
+    # 禁止访问的目录
+    forbidden_directories: List[str] = field(default_factory=lambda: _env_list(
+        "FORBIDDEN_DIRECTORIES", 
+        "./,../,/etc,/var,C:\\Windows"
+    ))
+    
+    # ===========================================
+    # 性能配置
+    # ===========================================
+    
+    # 连接池大小
+    connection_pool_size: int = field(default_factory=lambda: int(os.getenv("CONNECTION_POOL_SIZE", "10")))
+    
+    # 最大重试次数
+    max_retries: int = field(default_factory=lambda: int(os.getenv("MAX_RETRIES", "3")))
+    
+    # 缓存过期时间（秒）
+    cache_expiry: int = field(default_factory=lambda: int(os.getenv("CACHE_EXPIRY", "300")))
+    
+    # 是否缓存对话结果（相同消息直接返回上次的回复）
+    cache_enabled: bool = field(
+        default_factory=lambda: os.getenv("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    )
+    
+    # 对话缓存最大条目数
+    cache_max_size: int = field(default_factory=lambda: int(os.getenv("CACHE_MAX_SIZE", "512")))
+    
+    # 同时进行的 LLM 请求上限（避免触发服务端限流）
+    max_concurrency: int = field(default_factory=lambda: int(os.getenv("MAX_CONCURRENCY", "8")))
+    
+    # 预先计算好的检查表，供 is_file_allowed 直接使用（在 __post_init__ 中填充）
+    _allowed_ext: tuple = field(init=False, repr=False)
+    _forbidden_abs: tuple = field(init=False, repr=False)
+    
+    def __post_init__(self) -> None:
+        """字段读取完成后：生成检查表、验证配置、确保工作目录存在"""
         
-        # 允许的文件扩展名
-        allowed_extensions = os.getenv(
-            "ALLOWED_FILE_EXTENSIONS", 
-            ".txt,.md,.json,.csv,.log"
+        # 实例是只读的，派生字段需要通过 object.__setattr__ 写入
+        object.__setattr__(
+            self, "_allowed_ext",
+            tuple(ext.lower() for ext in self.allowed_file_extensions)
         )
-        self.allowed_file_extensions: List[str] = [
-            ext.strip() for ext in allowed_extensions.split(",")
-        ]
-        
-        # 禁止访问的目录
-        forbidden_dirs = os.getenv(
-            "FORBIDDEN_DIRECTORIES", 
-            "./,../,/etc,/var,C:\\Windows"
+        object.__setattr__(
+            self, "_forbidden_abs",
+            tuple(os.path.abspath(d) for d in self.forbidden_directories)
         )
-        self.forbidden_directories: List[str] = [
-            dir.strip() for dir in forbidden_dirs.split(",")
-        ]
-        
-        # ===========================================
-        # 性能配置
-        # ===========================================
-        
-        # 连接池大小
-        self.connection_pool_size: int = int(os.getenv("CONNECTION_POOL_SIZE", "10"))
-        
-        # 最大重试次数
-        self.max_retries: int = int(os.getenv("MAX_RETRIES", "3"))
-        
-        # 缓存过期时间（秒）
-        self.cache_expiry: int = int(os.getenv("CACHE_EXPIRY", "300"))
         
         # 初始化后验证配置
         self._validate_config()
@@ -133,12 +165,18 @@ class Config:
         if self.api_timeout <= 0:
             raise ValueError(f"API_TIMEOUT 必须大于 0: {self.api_timeout}")
         
+        # 检查并发上限
+        if self.max_concurrency <= 0:
+            raise ValueError(f"MAX_CONCURRENCY 必须大于 0: {self.max_concurrency}")
+        
         # 检查日志级别
         valid_log_levels = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
         if self.log_level.upper() not in valid_log_levels:
             raise ValueError(f"LOG_LEVEL 无效: {self.log_level}")
         
-        print(f"✅ 配置验证通过")
+        # 根日志器跟随 LOG_LEVEL；调用方已配置过日志时 basicConfig 不做任何事
+        logging.basicConfig(level=self.log_level.upper())
+        logger.info("✅ 配置验证通过")
     
     def _ensure_work_directory(self) -> None:
         """
@@ -146,11 +184,12 @@ class Config:
         
         如果工作目录不存在，则创建它
         """
-        if not os.path.exists(self.work_directory):
-            os.makedirs(self.work_directory, exist_ok=True)
-            print(f"📁 创建工作目录: {self.work_directory}")
-        else:
-            print(f"📁 工作目录已存在: {self.work_directory}")
+        # 直接尝试创建：已存在时由 FileExistsError 区分，省去单独的 exists 检查
+        try:
+            os.makedirs(self.work_directory)
+            logger.info("📁 创建工作目录: %s", self.work_directory)
+        except FileExistsError:
+            logger.info("📁 工作目录已存在: %s", self.work_directory)
     
     def get_api_headers(self) -> dict:
         """
@@ -179,18 +218,12 @@ class Config:
         Returns:
             bool: 如果文件允许访问返回 True，否则返回 False
         """
-        # 检查文件扩展名
-        _, ext = os.path.splitext(filename.lower())
-        if ext not in self.allowed_file_extensions:
+        # 检查文件扩展名（endswith 接受元组，一次调用检查所有扩展名）
+        if not filename.lower().endswith(self._allowed_ext):
             return False
         
         # 检查是否在禁止目录中
-        abs_path = os.path.abspath(filename)
-        for forbidden_dir in self.forbidden_directories:
-            if abs_path.startswith(os.path.abspath(forbidden_dir)):
-                return False
-        
-        return True
+        return not os.path.abspath(filename).startswith(self._forbidden_abs)
     
     def print_config_summary(self) -> None:
         """
@@ -211,6 +244,56 @@ class Config:
         print("="*50 + "\n")
 
 
+# 时钟缓存：(上次刷新的 monotonic 时间, 对应的 datetime)
+_now_cache = (float("-inf"), datetime.now())
+
+# 当前缓存时刻的格式化结果：格式字符串 -> 字符串
+_now_text_cache: Dict[str, str] = {}
+
+
+def get_cached_now(resolution: float = 1.0) -> datetime:
+    """
+    获取当前时间（按 resolution 秒的精度缓存）
+    
+    在 resolution 秒内的重复调用直接返回上次的结果，不再重新读取系统时钟。
+    
+    Args:
+        resolution (float): 缓存精度（秒）
+        
+    Returns:
+        datetime: 当前时间
+    """
+    global _now_cache
+    
+    last_mono, last_dt = _now_cache
+    mono = time.monotonic()
+    if mono - last_mono < resolution:
+        return last_dt
+    
+    now = datetime.now()
+    _now_cache = (mono, now)
+    _now_text_cache.clear()
+    return now
+
+
+def format_cached_now(fmt: str = "%Y-%m-%d %H:%M:%S", resolution: float = 1.0) -> str:
+    """
+    获取格式化后的当前时间（同一缓存时刻内每种格式只调用一次 strftime）
+    
+    Args:
+        fmt (str): strftime 格式字符串
+        resolution (float): 缓存精度（秒）
+        
+    Returns:
+        str: 格式化后的时间字符串
+    """
+    now = get_cached_now(resolution)
+    text = _now_text_cache.get(fmt)
+    if text is None:
+        text = _now_text_cache[fmt] = now.strftime(fmt)
+    return text
+
+
 # 创建全局配置实例
 # 这样其他模块可以直接导入使用：from src.config import config
 config = Config()
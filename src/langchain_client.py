@@ -5,27 +5,183 @@ Langchain + MCP 集成客户端
 实现 AI 代理通过标准 MCP 协议调用外部工具。
 """
 
-import json
+import re
+import time
+import logging
 import asyncio
-from typing import Dict, Any, List, Optional
+import hashlib
+import threading
+import weakref
+import concurrent.futures
+from collections import OrderedDict
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional, Tuple
 from langchain_core.language_models.llms import LLM
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
+from langchain_core.callbacks.manager import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
 from langchain.tools import Tool
 
-# 使用绝对导入
+# 使用绝对导入（config / mcp_client / mcp_server 与本文件同在 src 目录下）
 import sys
 import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config import config
 from mcp_client import MCPClient
 from mcp_server import MCPServer
+import orjson
 import requests
+import httpx
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+# 对话过程日志：调用方配置为 QueueHandler 时，记录日志只入队，不在事件循环上写终端
+log = logging.getLogger("mcp")
 
 # 创建全局 MCP 实例 保持1对1的链接
 mcp_server = MCPServer()
 mcp_client = MCPClient(server=mcp_server)
 
+# 限制同时进行的对话数量，避免并发请求触发 LLM 服务端限流（429）。
+# asyncio.Semaphore 会绑定到第一次等待它的事件循环，因此每个事件循环各用一个
+_chat_semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _chat_semaphore() -> asyncio.Semaphore:
+    """返回当前事件循环的对话并发限制信号量（首次使用时创建）"""
+    
+    loop = asyncio.get_running_loop()
+    semaphore = _chat_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _chat_semaphores.setdefault(loop, asyncio.Semaphore(config.max_concurrency))
+    return semaphore
+
+# 会改变工具状态的消息关键词：这类消息不走缓存，并且执行后清空缓存
+_STATE_CHANGING_MARKERS = ("创建", "写入")
+
+# 结果不可复现的消息关键词：这类消息既不查缓存也不写缓存
+_NONDETERMINISTIC_MARKERS = ("随机", "当前时间", "time.time")
+
+# 规划回复中的工具调用行："MCP_TOOL: 工具名称" 或 "MCP_PARAMS: {JSON 参数}"
+_MCP_LINE_RE = re.compile(r"MCP_(TOOL|PARAMS):\s*(.*?)\s*$")
+
+# 规划提示中附加在工具描述后的参数说明
+_TOOL_PARAM_HINTS = {
+    "write_file": " (参数: path=文件路径, content=文件内容)",
+    "read_file": " (参数: path=文件路径)",
+    "calculate": " (参数: expression=数学表达式)",
+    "get_current_time": " (无参数)",
+}
+
+
+def _is_transient_error(exc: BaseException) -> bool:
+    """判断 LLM 请求错误是否值得重试：读超时、限流（429）或服务端错误（5xx）"""
+    
+    if isinstance(exc, httpx.ReadTimeout):
+        return True
+    
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    
+    return False
+
+
+# 临时性错误按指数退避（带抖动）重试，最多尝试 3 次
+_llm_retry = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=0.5, max=8),
+    retry=retry_if_exception(_is_transient_error),
+    reraise=True
+)
+
+# LLM 请求级缓存的最大条目数
+_LLM_CACHE_SIZE = 1024
+
+# LLM 请求级缓存（LRU + TTL）：键为请求体的 blake2b 摘要，值为 (写入时间, 回复内容)。
+# 与对话缓存不同，这里缓存的是单次 chat/completions 请求：规划提示相同的消息
+# 直接复用规划结果，工具调用仍会重新执行；最终提示中包含工具结果，结果变化时自然不会命中
+_llm_cache: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()
+
+
+def _llm_cache_key(request_data: Dict[str, Any]) -> bytes:
+    """LLM 请求缓存键：按键排序后的请求体 JSON（orjson 编码）的 blake2b 摘要"""
+    
+    return hashlib.blake2b(
+        orjson.dumps(request_data, option=orjson.OPT_SORT_KEYS),
+        digest_size=16
+    ).digest()
+
+
+def _llm_cache_get(key: bytes) -> Optional[str]:
+    """查询 LLM 请求缓存，命中且未过期时返回回复内容"""
+    
+    if not config.cache_enabled:
+        return None
+    
+    entry = _llm_cache.get(key)
+    if entry is None:
+        return None
+    
+    stored_at, text = entry
+    if time.monotonic() - stored_at > config.cache_expiry:
+        del _llm_cache[key]
+        return None
+    
+    _llm_cache.move_to_end(key)
+    return text
+
+
+def _llm_cache_put(key: bytes, text: str) -> None:
+    """写入 LLM 请求缓存，超出容量时淘汰最久未使用的条目"""
+    
+    if not config.cache_enabled:
+        return
+    
+    _llm_cache[key] = (time.monotonic(), text)
+    _llm_cache.move_to_end(key)
+    if len(_llm_cache) > _LLM_CACHE_SIZE:
+        _llm_cache.popitem(last=False)
+
+
+def _create_session() -> requests.Session:
+    """
+    创建同步调用共用的 requests.Session
+    
+    连接池保持 Keep-Alive，连续的同步调用不再每次重新建立 TCP+TLS 连接；
+    限流（429）和网关错误在适配器中按退避重试，次数取 config.max_retries。
+    """
+    
+    retries = Retry(
+        total=config.max_retries,
+        backoff_factor=0.2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        # chat/completions 是 POST 请求，需要显式允许重试
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retries)
+    
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# 模块级共享会话：所有 CustomLLM 实例的同步调用复用同一个连接池
+_SESSION = _create_session()
+
+# SSE 流结束（收到 "data: [DONE]"）时 _parse_sse_line 返回的哨兵对象
+_SSE_DONE = object()
+
 
 class CustomLLM(LLM):
     """
@@ -38,20 +194,20 @@ class CustomLLM(LLM):
         self._api_url = f"{config.api_base_url}/chat/completions"
         self._headers = config.get_api_headers()
         self._model_name = config.model_name
+        self._session = _SESSION
         
-        print(f"🤖 初始化 LLM: {self._model_name}")
+        # 异步 HTTP 客户端在首次异步调用时创建（见 _async_http）
+        self._http: Optional[httpx.AsyncClient] = None
+        self._http_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        log.info("🤖 初始化 LLM: %s", self._model_name)
     
     @property
     def _llm_type(self) -> str:
         return "custom_api"
     
-    def _call(
-        self,
-        prompt: str,
-        stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
-        **kwargs: Any,
-    ) -> str:
+    def _build_request(self, prompt: str, stop: Optional[List[str]], **kwargs: Any) -> Dict[str, Any]:
+        """构建 chat/completions 请求体"""
         
         request_data = {
             "model": self._model_name,
@@ -63,24 +219,424 @@ class CustomLLM(LLM):
         if stop:
             request_data["stop"] = stop
         
+        return request_data
+    
+    @staticmethod
+    def _parse_response(response_data: Dict[str, Any]) -> str:
+        """从 chat/completions 响应中取出回复内容"""
+        
+        if "choices" in response_data and len(response_data["choices"]) > 0:
+            return response_data["choices"][0]["message"]["content"]
+        else:
+            raise ValueError("API 响应格式错误")
+    
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        
+        request_data = self._build_request(prompt, stop, **kwargs)
+        
+        key = _llm_cache_key(request_data)
+        cached = _llm_cache_get(key)
+        if cached is not None:
+            return cached
+        
         try:
-            response = requests.post(
+            # 请求体用 orjson 预先编码为字节，Content-Type 已包含在 self._headers 中
+            response = self._session.post(
                 self._api_url,
                 headers=self._headers,
-                json=request_data,
+                data=orjson.dumps(request_data),
                 timeout=config.api_timeout
             )
             
             response.raise_for_status()
-            response_data = response.json()
-            
-            if "choices" in response_data and len(response_data["choices"]) > 0:
-                return response_data["choices"][0]["message"]["content"]
-            else:
-                raise ValueError("API 响应格式错误")
+            text = self._parse_response(orjson.loads(response.content))
+                
+        except Exception as e:
+            raise Exception(f"LLM 调用失败: {str(e)}")
+        
+        _llm_cache_put(key, text)
+        return text
+    
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        
+        request_data = self._build_request(prompt, stop, **kwargs)
+        
+        key = _llm_cache_key(request_data)
+        cached = _llm_cache_get(key)
+        if cached is not None:
+            return cached
+        
+        try:
+            text = self._parse_response(await self._apost(request_data))
+                
+        except Exception as e:
+            raise Exception(f"LLM 调用失败: {str(e)}")
+        
+        _llm_cache_put(key, text)
+        return text
+    
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        """
+        批量生成（llm.generate / llm.batch 的同步入口）
+        
+        默认实现逐条调用 _call；这里在线程池中并发发送，共用同一个 requests.Session 连接池。
+        """
+        
+        if len(prompts) <= 1:
+            texts = [self._call(prompt, stop=stop, **kwargs) for prompt in prompts]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(len(prompts), config.max_concurrency),
+                thread_name_prefix="llm-generate"
+            ) as executor:
+                texts = list(executor.map(
+                    lambda prompt: self._call(prompt, stop=stop, **kwargs),
+                    prompts
+                ))
+        
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
+    
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        """
+        批量生成（llm.agenerate / llm.abatch 的异步入口）
+        
+        默认实现逐条 await _acall；这里用 asyncio.gather 并发发送，同时进行的请求数受 config.max_concurrency 限制。
+        """
+        
+        semaphore = asyncio.Semaphore(config.max_concurrency)
+        
+        async def _bounded(prompt: str) -> str:
+            async with semaphore:
+                return await self._acall(prompt, stop=stop, **kwargs)
+        
+        texts = await asyncio.gather(*[_bounded(p) for p in prompts])
+        
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
+    
+    @_llm_retry
+    async def _apost(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        发送一次 chat/completions 请求并返回响应 JSON
+        
+        重试只发生在单次 LLM 请求这一层：同一轮对话中已经执行过的
+        MCP 工具调用不会因为后续 LLM 请求的临时失败而被重复执行。
+        """
+        
+        response = await self._async_http().post(self._api_url, content=orjson.dumps(request_data))
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        """以 SSE 流式接收回复，每收到一段内容就产出一个 chunk"""
+        
+        request_data = self._build_request(prompt, stop, **kwargs)
+        
+        # 与非流式请求共用缓存：命中时整段回复作为一个 chunk 产出
+        key = _llm_cache_key(request_data)
+        cached = _llm_cache_get(key)
+        if cached is not None:
+            chunk = GenerationChunk(text=cached)
+            if run_manager:
+                await run_manager.on_llm_new_token(cached, chunk=chunk)
+            yield chunk
+            return
+        
+        request_data["stream"] = True
+        pieces = []
+        
+        try:
+            async with self._async_http().stream("POST", self._api_url, content=orjson.dumps(request_data)) as response:
+                response.raise_for_status()
+                
+                async for line in response.aiter_lines():
+                    text = self._parse_sse_line(line)
+                    if text is _SSE_DONE:
+                        break
+                    if not text:
+                        continue
+                    
+                    pieces.append(text)
+                    chunk = GenerationChunk(text=text)
+                    if run_manager:
+                        await run_manager.on_llm_new_token(text, chunk=chunk)
+                    yield chunk
+                    
+        except Exception as e:
+            raise Exception(f"LLM 调用失败: {str(e)}")
+        
+        # 完整接收后才写入缓存，中途中断的回复不会被缓存
+        _llm_cache_put(key, "".join(pieces))
+    
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        """同步版本的流式接收（经共享的 requests.Session），供 llm.stream() 使用"""
+        
+        request_data = self._build_request(prompt, stop, **kwargs)
+        
+        key = _llm_cache_key(request_data)
+        cached = _llm_cache_get(key)
+        if cached is not None:
+            chunk = GenerationChunk(text=cached)
+            if run_manager:
+                run_manager.on_llm_new_token(cached, chunk=chunk)
+            yield chunk
+            return
+        
+        request_data["stream"] = True
+        pieces = []
+        
+        try:
+            with self._session.post(
+                self._api_url,
+                headers=self._headers,
+                data=orjson.dumps(request_data),
+                timeout=config.api_timeout,
+                stream=True
+            ) as response:
+                response.raise_for_status()
                 
+                for line in response.iter_lines(decode_unicode=True):
+                    text = self._parse_sse_line(line)
+                    if text is _SSE_DONE:
+                        break
+                    if not text:
+                        continue
+                    
+                    pieces.append(text)
+                    chunk = GenerationChunk(text=text)
+                    if run_manager:
+                        run_manager.on_llm_new_token(text, chunk=chunk)
+                    yield chunk
+                    
         except Exception as e:
             raise Exception(f"LLM 调用失败: {str(e)}")
+        
+        _llm_cache_put(key, "".join(pieces))
+    
+    @staticmethod
+    def _parse_sse_line(line: Optional[str]) -> Any:
+        """
+        解析一行 SSE 数据
+        
+        Returns:
+            Optional[str]: 本行携带的回复片段；非数据行或没有内容时为 None，
+            收到结束标记时为 _SSE_DONE
+        """
+        
+        if not line or not line.startswith("data:"):
+            return None
+        
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return _SSE_DONE
+        
+        choices = orjson.loads(data).get("choices") or []
+        return choices[0].get("delta", {}).get("content") if choices else None
+    
+    def _async_http(self) -> httpx.AsyncClient:
+        """
+        返回当前事件循环使用的异步 HTTP 客户端
+        
+        同一事件循环内的异步调用共享一个连接池，开启 HTTP/2 后并发请求可以复用
+        同一条 TCP+TLS 连接。连接池属于创建它的事件循环，换了事件循环（再次
+        asyncio.run）或调用 aclose() 之后重新创建。
+        """
+        
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http_loop is not loop:
+            self._http = httpx.AsyncClient(
+                http2=True,
+                headers=self._headers,
+                timeout=config.api_timeout,
+                limits=httpx.Limits(
+                    max_keepalive_connections=16,
+                    max_connections=32
+                )
+            )
+            self._http_loop = loop
+        return self._http
+    
+    async def aclose(self) -> None:
+        """关闭异步 HTTP 连接池（之后的异步调用会重新创建）"""
+        
+        http, loop = self._http, self._http_loop
+        self._http = self._http_loop = None
+        # 属于已结束事件循环的连接池无法再关闭，直接丢弃
+        if http is not None and loop is asyncio.get_running_loop():
+            await http.aclose()
+
+
+class BatchedLLM:
+    """
+    CustomLLM 的微批处理包装
+    
+    并发对话提交的提示先进入队列，后台任务每隔 flush_interval 秒
+    （或攒满 batch_size 条时）取出一批：批内相同的提示只发送一次请求，
+    结果分发给所有等待者；不同的提示并发发送，总并发受 max_concurrency 限制。
+    
+    自定义 LLM 接口不支持一次请求多个提示词，因此批内仍是逐条请求，
+    节省的是重复提示的请求和突发并发对服务端的冲击。
+    """
+    
+    def __init__(
+        self,
+        llm: CustomLLM,
+        batch_size: int = 8,
+        flush_interval: float = 0.01,
+        max_concurrency: int = 16
+    ):
+        """
+        Args:
+            llm (CustomLLM): 实际发送请求的 LLM
+            batch_size (int): 一批最多包含的提示数量
+            flush_interval (float): 攒批的最长等待时间（秒）
+            max_concurrency (int): 同时进行的 LLM 请求上限
+        """
+        self.llm = llm
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_concurrency = max_concurrency
+        
+        # 队列和后台任务属于某个事件循环，换了事件循环（再次 asyncio.run）时重新创建
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: set = set()
+    
+    async def submit(self, prompt: str) -> str:
+        """
+        提交一个提示，等待所在批次完成后返回回复内容
+        
+        Args:
+            prompt (str): 提示
+            
+        Returns:
+            str: LLM 回复
+        """
+        
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._worker = loop.create_task(self._run())
+        
+        future = loop.create_future()
+        self._queue.put_nowait((prompt, future))
+        return await future
+    
+    async def _run(self) -> None:
+        """后台任务：攒批并分发请求"""
+        
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # 批内相同的提示合并为一次请求
+            waiters: Dict[str, List[asyncio.Future]] = {}
+            for prompt, future in batch:
+                waiters.setdefault(prompt, []).append(future)
+            
+            # 每个请求单独成为任务，慢请求不会拖住下一批的攒批
+            for prompt, futures in waiters.items():
+                task = loop.create_task(self._dispatch(prompt, futures))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+    
+    async def _dispatch(self, prompt: str, futures: List[asyncio.Future]) -> None:
+        """发送一次请求，把结果（或异常）交给所有等待者"""
+        
+        try:
+            async with self._semaphore:
+                text = await self.llm._acall(prompt)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for future in futures:
+            if not future.done():
+                future.set_result(text)
+    
+    async def aclose(self) -> None:
+        """停止后台攒批任务"""
+        
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+
+# 同步调用工具时使用的常驻事件循环（在守护线程中运行，首次使用时创建）
+_bridge_loop: Optional[asyncio.AbstractEventLoop] = None
+_bridge_lock = threading.Lock()
+
+
+def _get_bridge_loop() -> asyncio.AbstractEventLoop:
+    """获取常驻的后台事件循环，供同步代码提交协程"""
+    
+    global _bridge_loop
+    
+    with _bridge_lock:
+        if _bridge_loop is None:
+            _bridge_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_bridge_loop.run_forever,
+                name="mcp-tool-bridge",
+                daemon=True
+            ).start()
+        return _bridge_loop
 
 
 class MCPToolWrapper:
@@ -90,6 +646,8 @@ class MCPToolWrapper:
     这个包装器通过标准 MCP 协议与 MCP Server 通信
     """
     
+    __slots__ = ("tool_name", "tool_info")
+    
     def __init__(self, tool_name: str, tool_info: Dict[str, Any]):
         """
         初始化真正的 MCP 工具包装器
@@ -101,9 +659,9 @@ class MCPToolWrapper:
         self.tool_name = tool_name
         self.tool_info = tool_info
     
-    def __call__(self, **kwargs) -> str:
+    async def acall(self, **kwargs) -> str:
         """
-        通过 MCP 协议调用工具
+        通过 MCP 协议调用工具（异步版本，在调用方的事件循环中直接执行）
         
         Args:
             **kwargs: 工具参数
@@ -113,30 +671,49 @@ class MCPToolWrapper:
         """
         try:
             # 🔑 关键：这里使用真正的 MCP 协议进行通信
-            # 检查是否已有事件循环在运行
-            try:
-                loop = asyncio.get_running_loop()
-                # 如果有运行中的循环，使用 asyncio.create_task
-                import concurrent.futures
-                with concurrent.futures.ThreadPoolExecutor() as executor:
-                    future = executor.submit(asyncio.run, mcp_client.call_tool(self.tool_name, kwargs))
-                    result = future.result()
-            except RuntimeError:
-                # 没有运行中的循环，创建新的
-                result = asyncio.run(mcp_client.call_tool(self.tool_name, kwargs))
+            return self._format_result(await mcp_client.call_tool(self.tool_name, kwargs))
+        except Exception as e:
+            return f"❌ MCP 工具调用异常: {str(e)}"
+    
+    def __call__(self, **kwargs) -> str:
+        """
+        通过 MCP 协议调用工具（同步版本，满足 Langchain Tool.func 的接口）
+        
+        协程提交到常驻的后台事件循环执行，不再为每次调用新建线程池和事件循环。
+        
+        Args:
+            **kwargs: 工具参数
             
-            if result["success"]:
-                output = f"✅ MCP 工具 '{self.tool_name}' 执行成功\n"
-                output += f"📡 通过 JSON-RPC 2.0 协议调用\n"
-                output += f"结果: {json.dumps(result['result'], ensure_ascii=False, indent=2)}"
-                return output
-            else:
-                output = f"❌ MCP 工具 '{self.tool_name}' 执行失败\n"
-                output += f"错误: {result['error']}"
-                return output
-                
+        Returns:
+            str: 工具执行结果
+        """
+        try:
+            future = asyncio.run_coroutine_threadsafe(
+                mcp_client.call_tool(self.tool_name, kwargs),
+                _get_bridge_loop()
+            )
+            try:
+                result = future.result(timeout=config.api_timeout)
+            except concurrent.futures.TimeoutError:
+                # 不再等待结果，也不让协程在后台事件循环中继续占用资源
+                future.cancel()
+                raise Exception(f"工具调用超时（{config.api_timeout} 秒）")
+            return self._format_result(result)
         except Exception as e:
             return f"❌ MCP 工具调用异常: {str(e)}"
+    
+    def _format_result(self, result: Dict[str, Any]) -> str:
+        """把 call_tool 的返回结果格式化为工具输出文本"""
+        
+        if result["success"]:
+            output = f"✅ MCP 工具 '{self.tool_name}' 执行成功\n"
+            output += f"📡 通过 JSON-RPC 2.0 协议调用\n"
+            output += f"结果: {orjson.dumps(result['result'], option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()}"
+            return output
+        else:
+            output = f"❌ MCP 工具 '{self.tool_name}' 执行失败\n"
+            output += f"错误: {result['error']}"
+            return output
 
 
 class MCPLangchainClient:
@@ -150,10 +727,18 @@ class MCPLangchainClient:
         """初始化 MCP Langchain 客户端"""
         
         self.llm = CustomLLM()
+        
+        # 非流式的 LLM 请求经过微批处理层：并发对话中相同的提示只请求一次
+        self._batched_llm = BatchedLLM(self.llm)
         self.mcp_initialized = False
         self.tools = []
+        self._prompt_body = self._render_prompt_body()
+        
+        # 对话结果缓存（LRU + TTL），键为 (模型名称, 消息) 的 blake2b 摘要，
+        # 值为 (写入时间, 结果)；过期时间取 config.cache_expiry
+        self._cache: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
         
-        print(f"🔗 真正的 MCP Langchain 客户端初始化中...")
+        log.info("🔗 真正的 MCP Langchain 客户端初始化中...")
     
     async def initialize(self) -> bool:
         """
@@ -168,7 +753,7 @@ class MCPLangchainClient:
             success = await mcp_client.initialize()
             
             if not success:
-                print("❌ MCP 客户端初始化失败")
+                log.error("❌ MCP 客户端初始化失败")
                 return False
             
             self.mcp_initialized = True
@@ -176,11 +761,11 @@ class MCPLangchainClient:
             # 创建 Langchain 工具
             await self._create_tools()
             
-            print(f"✅ 真正的 MCP Langchain 客户端初始化完成，集成了 {len(self.tools)} 个工具")
+            log.info("✅ 真正的 MCP Langchain 客户端初始化完成，集成了 %s 个工具", len(self.tools))
             return True
             
         except Exception as e:
-            print(f"❌ MCP Langchain 客户端初始化失败: {str(e)}")
+            log.error("❌ MCP Langchain 客户端初始化失败: %s", e)
             return False
     
     async def _create_tools(self) -> None:
@@ -205,7 +790,10 @@ class MCPLangchainClient:
             )
             
             self.tools.append(langchain_tool)
-            print(f"🔧 集成真正的 MCP 工具: {tool_name}")
+            log.debug("🔧 集成真正的 MCP 工具: %s", tool_name)
+        
+        # 工具集合变化后重新生成规划提示的固定部分
+        self._prompt_body = self._render_prompt_body()
     
     async def chat(self, message: str) -> Dict[str, Any]:
         """
@@ -226,18 +814,27 @@ class MCPLangchainClient:
             }
         
         try:
-            print(f"👤 用户: {message}")
-            print("🤖 通过真正的 MCP 协议处理...")
+            log.info("👤 用户: %s", message)
             
-            result = await self._process_with_mcp(message)
+            cached = self._get_cached(message)
+            if cached is not None:
+                log.info("🤖 助手（缓存）: %s", cached['output'])
+                return cached
             
-            print(f"🤖 助手: {result['output']}")
+            log.debug("🤖 通过真正的 MCP 协议处理...")
+            
+            async with _chat_semaphore():
+                result = await self._process_with_mcp(message)
+            
+            self._store_cached(message, result)
+            
+            log.info("🤖 助手: %s", result['output'])
             
             return result
             
         except Exception as e:
             error_msg = f"MCP 对话处理失败: {str(e)}"
-            print(f"❌ {error_msg}")
+            log.error("❌ %s", error_msg)
             
             return {
                 "success": False,
@@ -245,28 +842,237 @@ class MCPLangchainClient:
                 "output": "抱歉，处理您的请求时遇到了问题。"
             }
     
+    # 显式的异步入口：供调用方用 asyncio.gather 并发多个对话
+    achat = chat
+    
+    async def astream_chat(self, message: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式对话：回复内容一边生成一边产出
+        
+        工具规划阶段仍需拿到完整回复才能解析调用，
+        流式的是最终回复（或不需要工具时的直接回复）。
+        
+        Args:
+            message (str): 用户消息
+            
+        Yields:
+            Dict[str, Any]: {"event": "token", "data": 文本片段}，
+            最后一个事件为 {"event": "end", "data": 与 chat 相同格式的完整结果}
+        """
+        
+        if not self.mcp_initialized:
+            yield {
+                "event": "end",
+                "data": {
+                    "success": False,
+                    "error": "MCP 客户端未初始化",
+                    "output": "请先初始化 MCP 连接"
+                }
+            }
+            return
+        
+        log.info("👤 用户: %s", message)
+        
+        cached = self._get_cached(message)
+        if cached is not None:
+            yield {"event": "token", "data": cached["output"]}
+            yield {"event": "end", "data": cached}
+            return
+        
+        try:
+            async with _chat_semaphore():
+                async for event in self._stream_with_mcp(message):
+                    if event["event"] == "end":
+                        self._store_cached(message, event["data"])
+                    yield event
+            
+        except Exception as e:
+            error_msg = f"MCP 对话处理失败: {str(e)}"
+            log.error("❌ %s", error_msg)
+            
+            yield {
+                "event": "end",
+                "data": {
+                    "success": False,
+                    "error": error_msg,
+                    "output": "抱歉，处理您的请求时遇到了问题。"
+                }
+            }
+    
+    def _cache_key(self, message: str) -> bytes:
+        """对话缓存键：模型名称与消息的 blake2b 摘要"""
+        
+        return hashlib.blake2b(
+            f"{self.llm._model_name}\0{message}".encode("utf-8"),
+            digest_size=16
+        ).digest()
+    
+    def _get_cached(self, message: str) -> Optional[Dict[str, Any]]:
+        """查询对话缓存，命中且未过期时返回结果副本"""
+        
+        if not config.cache_enabled:
+            return None
+        
+        if any(marker in message for marker in _NONDETERMINISTIC_MARKERS):
+            return None
+        
+        key = self._cache_key(message)
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        
+        stored_at, result = entry
+        if time.monotonic() - stored_at > config.cache_expiry:
+            del self._cache[key]
+            return None
+        
+        self._cache.move_to_end(key)
+        return dict(result)
+    
+    def _store_cached(self, message: str, result: Dict[str, Any]) -> None:
+        """缓存成功的对话结果；会改变工具状态的消息会使已有缓存失效"""
+        
+        if not config.cache_enabled:
+            return
+        
+        if any(marker in message for marker in _STATE_CHANGING_MARKERS):
+            # 文件内容可能已变化，之前缓存的读取结果不再可信
+            self._cache.clear()
+            return
+        
+        if not result.get("success"):
+            return
+        
+        if any(marker in message for marker in _NONDETERMINISTIC_MARKERS):
+            return
+        
+        key = self._cache_key(message)
+        self._cache[key] = (time.monotonic(), dict(result))
+        self._cache.move_to_end(key)
+        if len(self._cache) > config.cache_max_size:
+            self._cache.popitem(last=False)
+    
+    async def chat_many(self, messages: List[str]) -> List[Dict[str, Any]]:
+        """
+        批量对话：一次提交多条互不依赖的消息
+        
+        自定义 LLM 接口不支持一次请求多个提示词，因此这里并发执行 achat，
+        同时受全局并发上限约束。每条结果额外记录 started_at / finished_at
+        （time.monotonic 时间戳），便于调用方统计单条耗时。
+        
+        Args:
+            messages (List[str]): 用户消息列表
+            
+        Returns:
+            List[Dict[str, Any]]: 与 messages 顺序一致的回复结果列表
+        """
+        
+        async def _timed(message: str) -> Dict[str, Any]:
+            started_at = time.monotonic()
+            result = await self.achat(message)
+            result["started_at"] = started_at
+            result["finished_at"] = time.monotonic()
+            return result
+        
+        return list(await asyncio.gather(*[_timed(m) for m in messages]))
+    
+    async def batch_chat(
+        self,
+        prompts: List[str],
+        max_concurrent: int = 8,
+        timeout: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        并发执行一组互不依赖的对话
+        
+        与 chat_many 不同，这里额外限制本批次的并发数量，并为每条对话设置超时；
+        单条对话超时或抛出异常时，对应位置返回失败结果，不影响其余对话。
+        
+        Args:
+            prompts (List[str]): 用户消息列表
+            max_concurrent (int): 本批次同时进行的对话上限
+            timeout (Optional[float]): 单条对话的超时时间（秒），None 表示不限制
+            
+        Returns:
+            List[Dict[str, Any]]: 与 prompts 顺序一致的回复结果列表
+        """
+        
+        semaphore = asyncio.Semaphore(max_concurrent)
+        
+        async def _bounded(prompt: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await asyncio.wait_for(self.achat(prompt), timeout)
+        
+        results = await asyncio.gather(*[_bounded(p) for p in prompts], return_exceptions=True)
+        
+        return [
+            result if not isinstance(result, BaseException) else {
+                "success": False,
+                "error": "对话超时" if isinstance(result, asyncio.TimeoutError) else str(result),
+                "output": "抱歉，处理您的请求时遇到了问题。"
+            }
+            for result in results
+        ]
+    
     async def _process_with_mcp(self, message: str) -> Dict[str, Any]:
         """使用真正的 MCP 协议处理消息"""
         
+        # 流式接收规划回复，工具调用在解析出来的同时开始执行
+        response, scheduled = await self._plan_with_prefetch(message)
+        
+        intermediate_steps, final_prompt = await self._collect_mcp_results(message, scheduled)
+        
+        if final_prompt is not None:
+            try:
+                final_response = await self._batched_llm.submit(final_prompt)
+                return self._make_result(final_response, intermediate_steps, with_tools=True)
+            except Exception as e:
+                log.warning("⚠️ MCP 工具调用解析失败: %s", e)
+        
+        # 直接回复
+        return self._make_result(response, intermediate_steps, with_tools=False)
+    
+    async def _stream_with_mcp(self, message: str) -> AsyncIterator[Dict[str, Any]]:
+        """与 _process_with_mcp 相同的流程，但流式产出最终回复"""
+        
+        response, scheduled = await self._plan_with_prefetch(message)
+        
+        intermediate_steps, final_prompt = await self._collect_mcp_results(message, scheduled)
+        
+        if final_prompt is not None:
+            chunks = []
+            async for chunk in self.llm.astream(final_prompt):
+                chunks.append(chunk)
+                yield {"event": "token", "data": chunk}
+            
+            yield {
+                "event": "end",
+                "data": self._make_result("".join(chunks), intermediate_steps, with_tools=True)
+            }
+            return
+        
+        # 直接回复：规划阶段的回复就是最终结果
+        yield {"event": "token", "data": response}
+        yield {
+            "event": "end",
+            "data": self._make_result(response, intermediate_steps, with_tools=False)
+        }
+    
+    def _build_prompt(self, message: str) -> str:
+        """构建规划阶段的提示（工具描述部分已在 _create_tools 中预先生成）"""
+        
+        return f"用户请求: {message}\n\n{self._prompt_body}"
+    
+    def _render_prompt_body(self) -> str:
+        """生成规划提示中除用户请求以外的部分（工具集合变化时重新生成）"""
+        
         # 构建工具描述（包含参数信息）
-        tools_desc = []
-        for tool in self.tools:
-            if tool.name == "write_file":
-                tools_desc.append(f"- {tool.name}: {tool.description} (参数: path=文件路径, content=文件内容)")
-            elif tool.name == "read_file":
-                tools_desc.append(f"- {tool.name}: {tool.description} (参数: path=文件路径)")
-            elif tool.name == "calculate":
-                tools_desc.append(f"- {tool.name}: {tool.description} (参数: expression=数学表达式)")
-            elif tool.name == "get_current_time":
-                tools_desc.append(f"- {tool.name}: {tool.description} (无参数)")
-            else:
-                tools_desc.append(f"- {tool.name}: {tool.description}")
-        tools_desc = "\n".join(tools_desc)
+        tools_desc = "\n".join(
+            f"- {tool.name}: {tool.description}{_TOOL_PARAM_HINTS.get(tool.name, '')}"
+            for tool in self.tools
+        )
         
-        # 构建提示
-        prompt = f"""用户请求: {message}
-
-这是一个使用真正 Model Context Protocol (MCP) 的系统！
+        return f"""这是一个使用真正 Model Context Protocol (MCP) 的系统！
 
 🔧 可用的 MCP 工具:
 {tools_desc}
@@ -282,55 +1088,155 @@ class MCPLangchainClient:
 2. 然后按照以下格式输出：
    MCP_TOOL: [工具名称]
    MCP_PARAMS: {{"参数名": "参数值"}}
-3. 如果不需要工具，直接回复用户
+3. 如果需要调用多个工具，按执行顺序重复输出多组 MCP_TOOL / MCP_PARAMS
+4. 如果不需要工具，直接回复用户
 
 请开始分析并处理用户请求："""
-
-        # 调用 LLM
-        response = self.llm(prompt)
+    
+    async def _plan_with_prefetch(self, message: str) -> Tuple[str, List[Tuple[str, Dict[str, Any], asyncio.Task]]]:
+        """
+        流式接收规划回复，每解析出一组 MCP_TOOL / MCP_PARAMS 就立即开始执行该工具
+        
+        工具执行与规划回复剩余部分的生成重叠进行；多个工具之间仍按回复中的
+        顺序依次执行（后一个任务先等待前一个完成），例如"先写入再读取"不会乱序。
+        
+        Returns:
+            Tuple[str, List[Tuple[str, Dict[str, Any], asyncio.Task]]]:
+            (完整的规划回复, 按顺序排列的 (工具名称, 参数, 执行任务))
+        """
+        
+        tools_by_name = {tool.name: tool for tool in self.tools}
+        scheduled = []
+        chunks = []
+        pending_line = ""
+        pending_tool: Optional[str] = None
+        deferred: List[str] = []
+        params_seen = False
+        previous: Optional[asyncio.Task] = None
+        
+        def dispatch(tool_name: str, params: Dict[str, Any]) -> None:
+            nonlocal previous
+            
+            tool = tools_by_name.get(tool_name)
+            if tool is None:
+                return
+            
+            log.debug("📡 通过 MCP 协议执行工具: %s", tool_name)
+            log.debug("📥 MCP 参数: %s", params)
+            
+            previous = asyncio.create_task(self._call_tool_after(previous, tool, params))
+            scheduled.append((tool_name, params, previous))
+        
+        def feed(line: str) -> None:
+            nonlocal pending_tool, params_seen
+            
+            match = _MCP_LINE_RE.match(line)
+            if match is None:
+                return
+            
+            kind, value = match.groups()
+            if kind == "TOOL":
+                # 上一个工具没有给出参数，按无参数调用；
+                # 回复中还没出现过 MCP_PARAMS 时先暂存，完全没有参数行的回复不视为工具调用
+                if pending_tool is not None:
+                    if params_seen:
+                        dispatch(pending_tool, {})
+                    else:
+                        deferred.append(pending_tool)
+                pending_tool = value
+            elif pending_tool is not None:
+                if not params_seen:
+                    params_seen = True
+                    for tool_name in deferred:
+                        dispatch(tool_name, {})
+                    deferred.clear()
+                try:
+                    params = orjson.loads(value)
+                except ValueError:
+                    params = {}
+                dispatch(pending_tool, params)
+                pending_tool = None
+        
+        prompt = self._build_prompt(message)
+        
+        try:
+            try:
+                async for chunk in self.llm._astream(prompt):
+                    chunks.append(chunk.text)
+                    
+                    # 只处理已经收到换行的完整行，剩余部分留到下一段
+                    *lines, pending_line = (pending_line + chunk.text).split("\n")
+                    for line in lines:
+                        feed(line)
+            except Exception:
+                if chunks:
+                    raise
+                # 还没收到任何内容就失败（如限流）：改用带重试的非流式请求
+                pending_line = await self._batched_llm.submit(prompt)
+                chunks = [pending_line]
+            
+            for line in pending_line.split("\n"):
+                feed(line)
+            
+            if pending_tool is not None and params_seen:
+                dispatch(pending_tool, {})
+        
+        except BaseException:
+            for _, _, task in scheduled:
+                task.cancel()
+            raise
+        
+        return "".join(chunks), scheduled
+    
+    @staticmethod
+    async def _call_tool_after(previous: Optional[asyncio.Task], tool: Tool, params: Dict[str, Any]) -> str:
+        """等待前一个工具执行完成后再执行当前工具"""
+        
+        if previous is not None:
+            await asyncio.wait([previous])
+        
+        # Tool.func 是 MCPToolWrapper：直接走异步路径，不经过线程和额外的事件循环
+        return await tool.func.acall(**params)
+    
+    async def _collect_mcp_results(
+        self,
+        message: str,
+        scheduled: List[Tuple[str, Dict[str, Any], asyncio.Task]]
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        等待预先开始执行的 MCP 工具调用完成，并生成最终回复的提示
+        
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: (工具执行记录, 生成最终回复的提示)；
+            没有执行任何工具时提示为 None
+        """
         
         intermediate_steps = []
+        tool_results = []
         
-        # 检查是否需要 MCP 工具调用
-        if "MCP_TOOL:" in response and "MCP_PARAMS:" in response:
+        for tool_name, params, task in scheduled:
             try:
-                # 解析 MCP 工具调用
-                lines = response.split('\n')
-                tool_name = None
-                params = {}
+                tool_result = await task
+            except Exception as e:
+                tool_result = f"❌ MCP 工具调用异常: {str(e)}"
+                
+            intermediate_steps.append({
+                "mcp_tool": tool_name,
+                "mcp_params": params,
+                "mcp_result": tool_result,
+                "success": not tool_result.startswith("❌"),
+                "protocol": "JSON-RPC 2.0"
+            })
+            tool_results.append(tool_result)
                 
-                for line in lines:
-                    if line.startswith("MCP_TOOL:"):
-                        tool_name = line.replace("MCP_TOOL:", "").strip()
-                    elif line.startswith("MCP_PARAMS:"):
-                        try:
-                            params_str = line.replace("MCP_PARAMS:", "").strip()
-                            params = json.loads(params_str)
-                        except:
-                            params = {}
+        if not tool_results:
+            return intermediate_steps, None
                 
-                # 执行 MCP 工具
-                if tool_name:
-                    tool_names = [tool.name for tool in self.tools]
-                    if tool_name in tool_names:
-                        tool = next(tool for tool in self.tools if tool.name == tool_name)
-                        
-                        print(f"📡 通过 MCP 协议执行工具: {tool_name}")
-                        print(f"📥 MCP 参数: {params}")
-                        
-                        # 🔑 关键：这里通过真正的 MCP 协议调用工具
-                        tool_result = tool.func(**params)
-                        
-                        intermediate_steps.append({
-                            "mcp_tool": tool_name,
-                            "mcp_params": params,
-                            "mcp_result": tool_result,
-                            "protocol": "JSON-RPC 2.0"
-                        })
-                        
-                        # 生成最终回复
-                        final_prompt = f"""MCP 工具执行结果：
-{tool_result}
+        all_results = "\n\n".join(tool_results)
+                    
+        # 生成最终回复
+        final_prompt = f"""MCP 工具执行结果：
+{all_results}
 
 原始用户请求：{message}
 
@@ -340,27 +1246,32 @@ class MCPLangchainClient:
 - 标准化的工具调用接口
 
 请根据 MCP 工具执行结果，生成一个友好、有用的回复给用户："""
-                        
-                        final_response = self.llm(final_prompt)
-                        
-                        return {
-                            "success": True,
-                            "output": final_response,
-                            "mcp_steps": intermediate_steps,
-                            "protocol_used": "Model Context Protocol (JSON-RPC 2.0)"
-                        }
-            
-            except Exception as e:
-                print(f"⚠️ MCP 工具调用解析失败: {str(e)}")
+                    
+        return intermediate_steps, final_prompt
+    
+    @staticmethod
+    def _make_result(output: str, mcp_steps: List[Dict[str, Any]], with_tools: bool) -> Dict[str, Any]:
+        """构建对话结果"""
         
-        # 直接回复
         return {
             "success": True,
-            "output": response,
-            "mcp_steps": intermediate_steps,
-            "protocol_used": "Direct LLM Response"
+            "output": output,
+            "mcp_steps": mcp_steps,
+            "protocol_used": "Model Context Protocol (JSON-RPC 2.0)" if with_tools else "Direct LLM Response"
         }
     
+    async def aclose(self) -> None:
+        """
+        停止微批处理任务，释放 LLM 的 HTTP 连接，并关闭 MCP Server 的工具线程池
+        
+        这些资源都会在下次使用时重新创建，关闭后客户端仍可继续使用。
+        """
+        
+        await self._batched_llm.aclose()
+        await self.llm.aclose()
+        # 等待正在执行的工具完成，不阻塞事件循环
+        await asyncio.to_thread(mcp_client.server.close)
+    
     def get_mcp_info(self) -> Dict[str, Any]:
         """获取 MCP 协议信息"""
         
@@ -380,10 +1291,18 @@ class MCPLangchainClient:
             }
         }
 
+    def get_server_stats(self) -> Dict[str, Any]:
+        """获取本客户端所连接的 MCP Server 的统计信息（工具列表、各工具调用次数等）"""
+        
+        return mcp_client.server.get_server_stats()
+
 
 # 创建真正的 MCP Langchain 客户端实例
 mcp_langchain_client = MCPLangchainClient()
 
+# 示例脚本中使用的名称
+langchain_client = mcp_langchain_client
+
 # 如果直接运行此文件，进行测试
 if __name__ == "__main__":
     import asyncio
@@ -432,5 +1351,11 @@ if __name__ == "__main__":
             else:
                 print(f"❌ 失败: {result['error']}")
     
-    # 运行测试
-    asyncio.run(test_mcp_langchain())
+    # 运行测试：安装了 uvloop 时使用 uvloop 事件循环（Windows 上没有 uvloop，使用默认事件循环）
+    try:
+        import uvloop
+        run = uvloop.run
+    except ImportError:
+        run = asyncio.run
+
+    run(test_mcp_langchain())
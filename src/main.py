@@ -13,6 +13,11 @@ Langchain 0.3 + MCP Server 的集成功能。
 
 import sys
 import os
+import queue
+import asyncio
+import threading
+import logging
+import logging.handlers
 from typing import Dict, Any
 
 # 添加项目根目录到 Python 路径
@@ -21,10 +26,34 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from src.config import config
-from src.mcp_server import mcp_server
 from src.langchain_client import langchain_client
 
 
+def setup_logging() -> logging.handlers.QueueListener:
+    """
+    把日志输出移到后台线程
+    
+    根日志器只保留一个 QueueHandler，记录日志时只是入队；
+    原来的处理器（例如 config 中 basicConfig 创建的终端输出）由 QueueListener
+    在后台线程中调用，终端较慢时也不会拖慢对话处理。
+    
+    Returns:
+        logging.handlers.QueueListener: 已启动的监听器，退出前需要调用 stop()
+    """
+    
+    root = logging.getLogger()
+    handlers = root.handlers[:] or [logging.StreamHandler()]
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    
+    log_queue = queue.SimpleQueue()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
 def print_welcome_message():
     """打印欢迎信息"""
     
@@ -37,9 +66,8 @@ def print_welcome_message():
     print("🔧 可用功能：")
     
     # 显示可用工具
-    tools_info = langchain_client.get_tools_info()
-    for tool in tools_info:
-        print(f"   📌 {tool['name']}: {tool['description'][:50]}...")
+    for tool in langchain_client.tools:
+        print(f"   📌 {tool.name}: {tool.description[:50]}...")
     
     print()
     print("💬 使用方法：")
@@ -84,23 +112,79 @@ def print_stats():
     print("\n📊 使用统计")
     print("-"*40)
     
-    # 获取统计信息
-    stats = langchain_client.get_usage_stats()
+    # 获取统计信息（客户端实际连接的 MCP Server）
+    stats = langchain_client.get_server_stats()
+    call_stats = stats["call_stats"]
+    total_calls = sum(call_stats.values())
     
-    print(f"🔧 工具总数: {stats['total_tools']}")
-    print(f"📞 总调用次数: {stats['total_calls']}")
+    print(f"🔧 工具总数: {stats['tools']['total']}")
+    print(f"📞 总调用次数: {total_calls}")
     
-    if stats['most_used_tool']:
-        print(f"🏆 最常用工具: {stats['most_used_tool']}")
+    if total_calls:
+        print(f"🏆 最常用工具: {max(call_stats, key=call_stats.get)}")
     
     print("\n📈 各工具使用次数:")
-    for tool_name, count in stats['tool_usage'].items():
+    for tool_name, count in call_stats.items():
         print(f"   • {tool_name}: {count} 次")
     
     print("-"*40 + "\n")
 
 
-def handle_user_input(user_input: str) -> bool:
+def clear_screen():
+    """清屏并重新显示欢迎信息"""
+    
+    # ANSI 转义序列：清屏并把光标移到左上角，不需要启动子进程执行 cls/clear
+    sys.stdout.write("\x1b[2J\x1b[H")
+    sys.stdout.flush()
+    print_welcome_message()
+
+
+# 退出命令
+_EXIT_COMMANDS = frozenset(('quit', 'exit', 'q'))
+
+# 特殊命令（小写）-> 处理函数：普通对话输入只需一次字典查找
+_COMMANDS = {}
+_COMMANDS.update(dict.fromkeys(('help', 'h', '帮助'), print_help))
+_COMMANDS.update(dict.fromkeys(('stats', 'statistics', '统计'), print_stats))
+_COMMANDS.update(dict.fromkeys(('clear', 'cls'), clear_screen))
+
+
+async def ainput(prompt: str) -> str:
+    """
+    在后台线程中读取一行输入，等待期间事件循环可以继续处理其他任务
+    
+    读取线程是守护线程：按 Ctrl+C 退出时不需要等它读完这一行。
+    
+    Args:
+        prompt (str): 输入提示
+        
+    Returns:
+        str: 读取到的一行（不含换行）
+        
+    Raises:
+        EOFError: 输入流已结束
+    """
+    
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    
+    def _deliver(setter, value) -> None:
+        if not future.done():
+            setter(value)
+    
+    def _read() -> None:
+        try:
+            line = input(prompt)
+        except BaseException as e:
+            loop.call_soon_threadsafe(_deliver, future.set_exception, e)
+        else:
+            loop.call_soon_threadsafe(_deliver, future.set_result, line)
+    
+    threading.Thread(target=_read, name="repl-input", daemon=True).start()
+    return await future
+
+
+async def handle_user_input(user_input: str) -> bool:
     """
     处理用户输入
     
@@ -118,21 +202,14 @@ def handle_user_input(user_input: str) -> bool:
         return True
     
     # 处理特殊命令
-    if user_input.lower() in ['quit', 'exit', 'q']:
+    command = user_input.lower()
+    if command in _EXIT_COMMANDS:
         print("👋 谢谢使用，再见！")
         return False
     
-    elif user_input.lower() in ['help', 'h', '帮助']:
-        print_help()
-        return True
-    
-    elif user_input.lower() in ['stats', 'statistics', '统计']:
-        print_stats()
-        return True
-    
-    elif user_input.lower() in ['clear', 'cls']:
-        os.system('cls' if os.name == 'nt' else 'clear')
-        print_welcome_message()
+    handler = _COMMANDS.get(command)
+    if handler is not None:
+        handler()
         return True
     
     # 处理正常对话
@@ -140,8 +217,8 @@ def handle_user_input(user_input: str) -> bool:
         print(f"\n👤 你: {user_input}")
         print("🤖 正在思考...")
         
-        # 调用 Langchain 客户端处理
-        result = langchain_client.chat(user_input)
+        # 调用 Langchain 客户端处理（与整个调用栈一样是异步的）
+        result = await langchain_client.chat(user_input)
         
         if result["success"]:
             print(f"🤖 助手: {result['output']}")
@@ -157,7 +234,9 @@ def handle_user_input(user_input: str) -> bool:
             print(f"❌ 处理失败: {result['error']}")
             print(f"🤖 助手: {result['output']}")
     
-    except KeyboardInterrupt:
+    except asyncio.CancelledError:
+        # 事件循环运行时，Ctrl+C 表现为取消当前任务：撤销取消，只中断这一次对话
+        asyncio.current_task().uncancel()
         print("\n\n⚠️ 操作被用户中断")
         return True
     
@@ -168,8 +247,8 @@ def handle_user_input(user_input: str) -> bool:
     return True
 
 
-def check_system_status():
-    """检查系统状态"""
+async def check_system_status():
+    """检查系统状态（在 MCP 连接建立之后调用）"""
     
     print("🔍 正在检查系统状态...")
     
@@ -178,20 +257,24 @@ def check_system_status():
         config.print_config_summary()
         
         # 检查 MCP Server
-        tools_count = len(mcp_server.tools)
+        tools_count = langchain_client.get_server_stats()["tools"]["total"]
         print(f"✅ MCP Server 运行正常，已注册 {tools_count} 个工具")
         
         # 检查 Langchain 客户端
         client_tools_count = len(langchain_client.tools)
         print(f"✅ Langchain 客户端运行正常，已集成 {client_tools_count} 个工具")
         
-        # 简单测试
+        # 简单测试：通过 MCP 协议调用一次时间工具
         print("🧪 正在进行系统测试...")
-        test_result = mcp_server.execute_tool("get_current_time", {})
-        if test_result["success"]:
-            print("✅ 系统测试通过")
+        time_tool = next((tool for tool in langchain_client.tools if tool.name == "get_current_time"), None)
+        if time_tool is None:
+            print("⚠️ 系统测试警告: 未发现 get_current_time 工具")
         else:
-            print(f"⚠️ 系统测试警告: {test_result['error']}")
+            test_output = await time_tool.func.acall()
+            if test_output.startswith("✅"):
+                print("✅ 系统测试通过")
+            else:
+                print(f"⚠️ 系统测试警告: {test_output}")
         
         return True
         
@@ -201,14 +284,25 @@ def check_system_status():
         return False
 
 
-def main():
+async def main():
     """主函数"""
     
+    listener = setup_logging()
+    
+    # Windows 控制台：执行一次空命令即可启用 ANSI 转义序列（清屏依赖它）
+    if os.name == 'nt':
+        os.system('')
+    
     try:
         print("🚀 正在启动 Langchain + MCP Server 演示系统...")
         
-        # 检查系统状态
-        if not check_system_status():
+        # 建立 MCP 连接
+        if not await langchain_client.initialize():
+            print("❌ MCP 连接初始化失败，无法继续运行")
+            return
+        
+        # 检查系统状态（工具在建立连接后才可用）
+        if not await check_system_status():
             print("❌ 系统初始化失败，无法继续运行")
             return
         
@@ -218,16 +312,16 @@ def main():
         # 主循环
         while True:
             try:
-                # 获取用户输入
-                user_input = input("💬 请输入: ").strip()
+                # 获取用户输入（在后台线程中读取，不阻塞事件循环）
+                user_input = (await ainput("💬 请输入: ")).strip()
                 
                 # 处理用户输入
-                if not handle_user_input(user_input):
+                if not await handle_user_input(user_input):
                     break
                 
                 print()  # 添加空行分隔
                 
-            except KeyboardInterrupt:
+            except (KeyboardInterrupt, asyncio.CancelledError):
                 print("\n\n👋 检测到 Ctrl+C，正在退出...")
                 break
             
@@ -240,8 +334,23 @@ def main():
         print("💡 请检查日志或联系开发者")
     
     finally:
+        await langchain_client.aclose()
+        
+        # 写出队列中剩余的日志
+        listener.stop()
         print("\n🛑 程序已退出")
 
 
 if __name__ == "__main__":
-    main()
+    # 安装了 uvloop 时使用 uvloop 事件循环（Windows 上没有 uvloop，使用默认事件循环）
+    try:
+        import uvloop
+        run = uvloop.run
+    except ImportError:
+        run = asyncio.run
+
+    try:
+        run(main())
+    except KeyboardInterrupt:
+        # 对话被中断后再次按下 Ctrl+C：直接退出
+        pass
@@ -7,14 +7,21 @@ MCP 客户端实现
 
 import json
 import asyncio
+import orjson
 import logging
 from typing import Dict, Any, List, Optional
-import uuid
+import secrets
 from dataclasses import dataclass
 
+logger = logging.getLogger(__name__)
+
 # 导入 MCP Server 以便进行本地测试
 # 在实际部署中，这里应该是网络连接
 
+# 请求模板：每次请求复制后只填写 id 和 params
+_TOOLS_LIST_REQUEST = {"jsonrpc": "2.0", "id": 0, "method": "tools/list"}
+_TOOLS_CALL_REQUEST = {"jsonrpc": "2.0", "id": 0, "method": "tools/call", "params": None}
+
 
 class MCPClient:
     """
@@ -23,6 +30,19 @@ class MCPClient:
     实现了完整的 Model Context Protocol 客户端功能
     """
     
+    # 属性集合固定，使用 __slots__ 省去实例 __dict__
+    __slots__ = (
+        "server",
+        "client_name",
+        "client_version",
+        "session_id",
+        "request_id",
+        "initialized",
+        "server_capabilities",
+        "available_tools",
+        "_inprocess",
+    )
+    
     def __init__(self, server=None, client_name: str = "Langchain-MCP-Client"):
         """
         初始化 MCP 客户端
@@ -34,13 +54,18 @@ class MCPClient:
         self.server = server
         self.client_name = client_name
         self.client_version = "1.0.0"
-        self.session_id = str(uuid.uuid4())
+        # 会话 ID 只需要一个随机字符串，不必构造 UUID 对象
+        self.session_id = secrets.token_hex(16)
         self.request_id = 0
         self.initialized = False
         self.server_capabilities = {}
         self.available_tools = []
         
-        logging.info(f"🔌 MCP 客户端初始化: {self.client_name}")
+        # 服务器在同一进程中时，工具调用直接分发，跳过 JSON-RPC 封装和结果的 JSON 编解码；
+        # 按接口判断而不是 isinstance，因为 mcp_server 可能以 src.mcp_server 和 mcp_server 两个模块名导入
+        self._inprocess = callable(getattr(server, "execute_tool_fast", None))
+        
+        logger.info("🔌 MCP 客户端初始化: %s", self.client_name)
     
     def _next_request_id(self) -> int:
         """生成下一个请求 ID"""
@@ -80,21 +105,21 @@ class MCPClient:
             response = await self.server.handle_request(init_request)
             
             if "error" in response and response["error"] is not None:
-                logging.error(f"MCP 初始化失败: {response['error']}")
+                logger.error("MCP 初始化失败: %s", response['error'])
                 return False
             
             # 解析服务器信息
             result = response.get("result")
             if result is None:
-                logging.error(f"MCP 初始化失败: result 为 None")
+                logger.error("MCP 初始化失败: result 为 None")
                 return False
             self.server_capabilities = result.get("capabilities", {})
             server_info = result.get("serverInfo", {})
             
             self.initialized = True
             
-            logging.info(f"✅ MCP 连接初始化成功")
-            logging.info(f"服务器: {server_info.get('name')} v{server_info.get('version')}")
+            logger.info("✅ MCP 连接初始化成功")
+            logger.info("服务器: %s v%s", server_info.get('name'), server_info.get('version'))
             
             # 获取可用工具列表
             await self._refresh_tools()
@@ -102,7 +127,7 @@ class MCPClient:
             return True
             
         except Exception as e:
-            logging.error(f"MCP 初始化异常: {str(e)}")
+            logger.error("MCP 初始化异常: %s", e)
             return False
     
     async def _refresh_tools(self) -> None:
@@ -113,28 +138,25 @@ class MCPClient:
         
         try:
             # 请求工具列表
-            list_request = {
-                "jsonrpc": "2.0",
-                "id": self._next_request_id(),
-                "method": "tools/list"
-            }
+            list_request = _TOOLS_LIST_REQUEST.copy()
+            list_request["id"] = self._next_request_id()
             
             response = await self.server.handle_request(list_request)
             
             if "error" in response and response["error"] is not None:
-                logging.error(f"获取工具列表失败: {response['error']}")
+                logger.error("获取工具列表失败: %s", response['error'])
                 return
             
             result = response.get("result")
             if result is None:
-                logging.error(f"获取工具列表失败: result 为 None")
+                logger.error("获取工具列表失败: result 为 None")
                 return
             self.available_tools = result.get("tools", [])
             
-            logging.info(f"📋 获取到 {len(self.available_tools)} 个可用工具")
+            logger.info("📋 获取到 %s 个可用工具", len(self.available_tools))
             
         except Exception as e:
-            logging.error(f"刷新工具列表异常: {str(e)}")
+            logger.error("刷新工具列表异常: %s", e)
     
     async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -151,17 +173,14 @@ class MCPClient:
         if not self.initialized:
             raise Exception("MCP 客户端未初始化")
         
+        if self._inprocess:
+            return await self._call_tool_inprocess(tool_name, arguments)
+        
         try:
             # 创建工具调用请求
-            call_request = {
-                "jsonrpc": "2.0",
-                "id": self._next_request_id(),
-                "method": "tools/call",
-                "params": {
-                    "name": tool_name,
-                    "arguments": arguments
-                }
-            }
+            call_request = _TOOLS_CALL_REQUEST.copy()
+            call_request["id"] = self._next_request_id()
+            call_request["params"] = {"name": tool_name, "arguments": arguments}
             
             # 发送请求
             response = await self.server.handle_request(call_request)
@@ -198,10 +217,15 @@ class MCPClient:
                 tool_result = {}
                 if content and content[0].get("type") == "text":
                     try:
-                        tool_result = json.loads(content[0]["text"])
-                    except json.JSONDecodeError:
+                        tool_result = orjson.loads(content[0]["text"])
+                    except orjson.JSONDecodeError:
                         tool_result = {"raw_text": content[0]["text"]}
                 
+                # 分块返回的大文件：第一块是结果信息，之后的文本块依次拼回 content
+                if isinstance(tool_result, dict) and "chunks" in tool_result and len(content) > 1:
+                    del tool_result["chunks"]
+                    tool_result["content"] = "".join(block.get("text", "") for block in content[1:])
+                
                 return {
                     "success": True,
                     "result": tool_result,
@@ -217,6 +241,26 @@ class MCPClient:
                 "arguments": arguments
             }
     
+    async def _call_tool_inprocess(self, tool_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """进程内快速路径：直接调用服务器的工具函数，返回与 call_tool 相同格式的结果"""
+        
+        try:
+            tool_result = await self.server.execute_tool_fast(tool_name, arguments)
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"工具执行失败: {str(e)}",
+                "tool_name": tool_name,
+                "arguments": arguments
+            }
+        
+        return {
+            "success": True,
+            "result": tool_result,
+            "tool_name": tool_name,
+            "arguments": arguments
+        }
+    
     def get_available_tools(self) -> List[Dict[str, Any]]:
         """
         获取可用工具列表
@@ -300,5 +344,11 @@ if __name__ == "__main__":
         read_result = await client.call_tool("read_file", {"path": "workspace/mcp_test.txt"})
         print(f"📖 文件读取: {json.dumps(read_result, indent=2, ensure_ascii=False)}")
     
-    # 运行测试
-    asyncio.run(test_mcp_client())
+    # 运行测试：安装了 uvloop 时使用 uvloop 事件循环（Windows 上没有 uvloop，使用默认事件循环）
+    try:
+        import uvloop
+        run = uvloop.run
+    except ImportError:
+        run = asyncio.run
+
+    run(test_mcp_client())
@@ -11,15 +11,343 @@ MCP 协议特点：
 4. 支持流式通信和会话管理
 """
 
+import ast
 import json
+import codecs
+import math
+import functools
 import asyncio
 import logging
-from typing import Dict, Any, List, Optional, Callable, Union
-from dataclasses import dataclass, asdict
+import operator
+from typing import Dict, Any, List, Optional, Callable, Union, Tuple
+from dataclasses import dataclass
 from enum import Enum
-import uuid
 import datetime
+import contextvars
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# 文件工具的 I/O 块大小（字节）：大小未知（如 /proc 下的文件）时按块读取
+IO_BUFFER_SIZE = int(os.getenv("IO_BUFFER_SIZE", str(128 * 1024)))
+
+# 不超过该大小（字节）的文件直接在事件循环线程中读写：
+# 一次 os.read / os.write 只需几微秒，比交给线程池的调度开销还小
+INLINE_IO_BYTES = int(os.getenv("INLINE_IO_BYTES", str(64 * 1024)))
+
+# 执行同步工具和大文件读写的线程数：每个 MCPServer 实例各有一个这样大小的线程池
+TOOL_THREADS = int(os.getenv("MCP_TOOL_THREADS", "8"))
+
+# 大文件按块读取的块大小（字节）：每块在 tools/call 结果中作为一个独立的 MCP 文本内容块
+READ_CHUNK_BYTES = int(os.getenv("READ_CHUNK_BYTES", str(1 << 20)))
+
+
+class ChunkedText(list):
+    """
+    分块的文本内容：tools/call 把每一块作为单独的文本内容块返回
+    
+    所有块仍然同时保存在内存中，分块只是把结果拆成较小的文本内容块，
+    并省去把整个文件 JSON 转义成一个字符串。
+    """
+
+
+def read_text(path: str) -> str:
+    """
+    读取整个 UTF-8 文本文件
+    
+    直接用 os.read 按 fstat 得到的大小一次读出，再整体解码一次，
+    不经过 TextIOWrapper 的分块增量解码。换行符与文本模式 open() 一样统一为 \\n。
+    """
+    
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        chunks = [os.read(fd, os.fstat(fd).st_size or IO_BUFFER_SIZE)]
+        while chunks[-1]:
+            chunks.append(os.read(fd, IO_BUFFER_SIZE))
+    finally:
+        os.close(fd)
+    
+    data = b"".join(chunks)
+    if b"\r" in data:
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    return data.decode("utf-8")
+
+
+def read_text_chunks(path: str) -> List[str]:
+    """
+    按 READ_CHUNK_BYTES 分块读取 UTF-8 文本文件，返回解码后的文本块列表
+    
+    使用增量解码器，跨块的多字节字符和 \\r\\n 都能正确处理；
+    换行符与 read_text 一样统一为 \\n。整个文件的内容会全部读入返回的列表，
+    占用的内存与一次读出相当。
+    """
+    
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks: List[str] = []
+    pending = ""
+    
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        while True:
+            data = os.read(fd, READ_CHUNK_BYTES)
+            text = pending + decoder.decode(data, final=not data)
+            # 块末尾的 \r 可能与下一块开头的 \n 组成一个换行，留到下一块处理
+            if data and text.endswith("\r"):
+                text, pending = text[:-1], "\r"
+            else:
+                pending = ""
+            if text:
+                chunks.append(text.replace("\r\n", "\n").replace("\r", "\n"))
+            if not data:
+                break
+    finally:
+        os.close(fd)
+    
+    return chunks
+
+
+def write_text(path: str, content: str) -> None:
+    """以 UTF-8 编码写入（覆盖）整个文本文件，编码一次后直接 os.write"""
+    
+    data = memoryview(content.encode("utf-8"))
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+
+# ===========================================
+# 计算工具的表达式编译
+# ===========================================
+# 表达式先解析成 AST，再降为后缀（逆波兰）指令：操作码序列 + 常量序列。
+# 安装了 numba（可选依赖）时，常量全部为浮点数的指令序列交给 JIT 编译的求值核执行
+# （此时 Python 的每个中间结果也都是 float，两者逐步一致）；含整数常量的表达式
+# 仍由 Python 执行，保持任意精度整数的语义。
+
+(_OP_CONST, _OP_ADD, _OP_SUB, _OP_MUL, _OP_DIV, _OP_MOD, _OP_POW, _OP_NEG,
+ _OP_FLOORDIV) = range(9)
+
+# 删除所有允许字符的转换表：translate 之后仍有剩余说明表达式含有不允许的字符
+_CALC_STRIP_ALLOWED = str.maketrans("", "", "0123456789+-*/().% ")
+
+_AST_BINOPS = {
+    ast.Add: _OP_ADD,
+    ast.Sub: _OP_SUB,
+    ast.Mult: _OP_MUL,
+    ast.Div: _OP_DIV,
+    ast.FloorDiv: _OP_FLOORDIV,
+    ast.Mod: _OP_MOD,
+    ast.Pow: _OP_POW,
+}
+
+_PY_BINOPS = {
+    _OP_ADD: operator.add,
+    _OP_SUB: operator.sub,
+    _OP_MUL: operator.mul,
+    _OP_DIV: operator.truediv,
+    _OP_FLOORDIV: operator.floordiv,
+    _OP_MOD: operator.mod,
+    _OP_POW: operator.pow,
+}
+
+
+@functools.lru_cache(maxsize=256)
+def _lower_expression(expression: str) -> tuple:
+    """
+    把算术表达式降为后缀指令，返回 (操作码元组, 常量元组)
+    
+    结果按表达式缓存，重复计算同一表达式时不再解析 AST；
+    返回不可变的元组，避免调用方修改缓存中的指令。
+    """
+    
+    ops: List[int] = []
+    consts: List[Union[int, float]] = []
+    
+    def visit(node: ast.AST) -> None:
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            ops.append(_OP_CONST)
+            consts.append(node.value)
+        elif isinstance(node, ast.BinOp) and type(node.op) in _AST_BINOPS:
+            visit(node.left)
+            visit(node.right)
+            ops.append(_AST_BINOPS[type(node.op)])
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+            visit(node.operand)
+            if isinstance(node.op, ast.USub):
+                ops.append(_OP_NEG)
+        else:
+            raise ValueError("表达式包含不支持的运算")
+    
+    visit(ast.parse(expression, mode="eval").body)
+    return tuple(ops), tuple(consts)
+
+
+def _run_program(ops: tuple, consts: tuple) -> Any:
+    """用 Python 执行后缀指令（保持 int / float 的原生语义）"""
+    
+    stack: List[Any] = []
+    next_const = iter(consts).__next__
+    
+    for op in ops:
+        if op == _OP_CONST:
+            stack.append(next_const())
+        elif op == _OP_NEG:
+            stack[-1] = -stack[-1]
+        else:
+            rhs = stack.pop()
+            stack[-1] = _PY_BINOPS[op](stack[-1], rhs)
+    
+    return stack[0]
+
+
+try:
+    import numpy as np
+    from numba import njit
+    
+    @njit(cache=True)
+    def _run_program_f64(ops, consts):
+        """JIT 编译的浮点求值核：ops 为 int8 数组，consts 为 float64 数组"""
+        stack = np.empty(ops.shape[0], np.float64)
+        top = 0
+        k = 0
+        for op in ops:
+            if op == 0:
+                stack[top] = consts[k]
+                top += 1
+                k += 1
+            elif op == 7:
+                stack[top - 1] = -stack[top - 1]
+            else:
+                top -= 1
+                lhs = stack[top - 1]
+                rhs = stack[top]
+                if op == 1:
+                    stack[top - 1] = lhs + rhs
+                elif op == 2:
+                    stack[top - 1] = lhs - rhs
+                elif op == 3:
+                    stack[top - 1] = lhs * rhs
+                elif op == 4:
+                    stack[top - 1] = lhs / rhs
+                elif op == 5:
+                    stack[top - 1] = lhs % rhs
+                elif op == 6:
+                    stack[top - 1] = lhs ** rhs
+                else:
+                    stack[top - 1] = lhs // rhs
+        return stack[0]
+
+except ImportError:  # numba 未安装时只使用 Python 求值
+    _run_program_f64 = None
+
+
+def evaluate_expression(expression: str) -> Union[int, float]:
+    """
+    计算算术表达式（只支持数字、+ - * / // % ** 和括号）
+    
+    Args:
+        expression (str): 算术表达式
+        
+    Returns:
+        Union[int, float]: 计算结果
+    """
+    
+    ops, consts = _lower_expression(expression)
+    
+    # 只有常量全部为浮点数时才交给 JIT 求值核：含整数常量时，即使最终结果是浮点数，
+    # 整数中间结果（如 10**17 + 1）在 float64 中也会丢失精度，结果会与 Python 求值不同
+    if _run_program_f64 is not None and consts and all(type(c) is float for c in consts):
+        result = float(_run_program_f64(
+            np.array(ops, dtype=np.int8),
+            np.array(consts, dtype=np.float64)
+        ))
+        # 溢出（inf）、负数的小数次幂（nan，Python 会得到复数）等情况
+        # 退回 Python 求值，保证结果或抛出的 OverflowError 与未安装 numba 时一致
+        if math.isfinite(result):
+            return result
+    
+    return _run_program(ops, consts)
+
+
+def _format_time(format: str, now: datetime.datetime) -> Dict[str, Any]:
+    """
+    构建时间工具的返回结果
+    
+    Args:
+        format (str): 时间格式（iso / timestamp / strftime 格式串）
+        now (datetime.datetime): 要格式化的时间（保留微秒精度）
+        
+    Returns:
+        Dict[str, Any]: 时间信息
+    """
+    
+    if format == "iso":
+        formatted_time = now.isoformat()
+    elif format == "timestamp":
+        formatted_time = str(now.timestamp())
+    else:
+        formatted_time = now.strftime(format)
+    
+    return {
+        "operation": "get_current_time",
+        "format": format,
+        "formatted_time": formatted_time,
+        "timestamp": now.timestamp(),
+        "iso_format": now.isoformat(),
+        "components": {
+            "year": now.year,
+            "month": now.month,
+            "day": now.day,
+            "hour": now.hour,
+            "minute": now.minute,
+            "second": now.second
+        }
+    }
+
+
+# 绑定到模块级名称，省去每次调用时的属性查找
+_now = datetime.datetime.now
+
+# 当前工具调用的开始时间：每次调用只取一次时间，工具内的时间戳共用这个值。
+# 线程池中的同步工具在 copy_context() 复制的上下文中运行，同样能读到
+_current_request_time: contextvars.ContextVar[Optional[datetime.datetime]] = contextvars.ContextVar(
+    "_current_request_time", default=None
+)
+
+
+def request_time() -> datetime.datetime:
+    """
+    返回当前工具调用的开始时间（协程工具和线程池中的同步工具都能读到）
+    
+    只有不在工具调用中时才返回当前时间。返回的是 datetime 对象，
+    放入工具结果时需调用 .isoformat() 转为字符串。
+    """
+    
+    return _current_request_time.get() or _now()
+
+
+# 工具结果的序列化选项：缩进 2 格，允许非字符串键
+_RESULT_DUMPS_OPTION = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+
+def dumps_result(result: Any) -> str:
+    """
+    把工具结果序列化为 JSON 文本
+    
+    orjson 不支持超出 64 位的整数（计算工具可能产生），这种情况退回标准库 json。
+    """
+    
+    try:
+        return orjson.dumps(result, option=_RESULT_DUMPS_OPTION).decode("utf-8")
+    except orjson.JSONEncodeError:
+        return json.dumps(result, ensure_ascii=False, indent=2)
+
 
 # MCP 协议相关的数据结构
 
@@ -35,31 +363,46 @@ class MethodType(Enum):
     READ_RESOURCE = "resources/read"
 
 
-@dataclass
+@dataclass(slots=True)
 class MCPError:
     """MCP 错误信息"""
     code: int
     message: str
     data: Optional[Dict[str, Any]] = None
 
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为 JSON-RPC 错误对象（data 为空时省略）"""
+        error = {"code": self.code, "message": self.message}
+        if self.data is not None:
+            error["data"] = self.data
+        return error
+
 
-@dataclass
+@dataclass(slots=True)
 class Tool:
     """MCP 工具定义"""
     name: str
     description: str
     inputSchema: Dict[str, Any]
 
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为 tools/list 中的工具定义"""
+        return {"name": self.name, "description": self.description, "inputSchema": self.inputSchema}
 
-@dataclass
+
+@dataclass(slots=True)
 class ToolResult:
     """工具执行结果"""
     content: List[Dict[str, Any]]
     isError: bool = False
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为 tools/call 的结果对象"""
+        return {"content": self.content, "isError": self.isError}
 
 
 
-@dataclass
+@dataclass(slots=True)
 class MCPRequest:
     """MCP 请求"""
     jsonrpc: str = "2.0"
@@ -68,13 +411,176 @@ class MCPRequest:
     params: Optional[Dict[str, Any]] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class MCPResponse:
     """MCP 响应"""
     jsonrpc: str = "2.0"
     id: Optional[Union[str, int]] = None
     result: Optional[Any] = None
     error: Optional[MCPError] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为 JSON-RPC 响应对象
+        
+        按 JSON-RPC 2.0 规范，result 和 error 只保留其中一个，值为 None 的字段省略。
+        手写字典而不是 dataclasses.asdict：后者会递归深拷贝整个结果。
+        """
+        response = {"jsonrpc": self.jsonrpc, "id": self.id}
+        if self.error is not None:
+            response["error"] = self.error.to_dict()
+        else:
+            response["result"] = self.result
+        return response
+
+
+try:
+    import fastjsonschema
+except ImportError:  # 未安装时使用 _check_schema
+    fastjsonschema = None
+
+# JSON Schema 中的类型名 -> Python 类型（fastjsonschema 未安装时的校验器使用）
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+def _check_schema(value: Any, schema: Dict[str, Any], path: str) -> None:
+    """按 schema 校验 value（只支持 type / const / required / properties），不通过时抛出 ValueError"""
+    
+    if "const" in schema and value != schema["const"]:
+        raise ValueError(f"{path} must be {schema['const']!r}")
+    
+    expected = schema.get("type")
+    if expected is not None:
+        names = [expected] if isinstance(expected, str) else expected
+        # bool 是 int 的子类，只有声明了 boolean 时才接受
+        if not any(
+            isinstance(value, _JSON_TYPES[name]) and (name == "boolean" or not isinstance(value, bool))
+            for name in names
+        ):
+            raise ValueError(f"{path} must be {' or '.join(names)}")
+    
+    if isinstance(value, dict):
+        for key in schema.get("required", ()):
+            if key not in value:
+                raise ValueError(f"{path} must contain {key!r} property")
+        for key, subschema in schema.get("properties", {}).items():
+            if key in value:
+                _check_schema(value[key], subschema, f"{path}.{key}")
+
+
+def compile_validator(schema: Dict[str, Any]) -> Callable[[Any], Any]:
+    """
+    把 JSON Schema 编译为校验函数（只编译一次，之后每次请求直接调用）
+    
+    安装了 fastjsonschema 时使用它生成的校验代码；否则使用简化的解释型校验器。
+    两种情况下校验失败都抛出 ValueError（fastjsonschema 的异常也是 ValueError 的子类）。
+    
+    Args:
+        schema (Dict[str, Any]): JSON Schema
+        
+    Returns:
+        Callable[[Any], Any]: 校验函数，通过时返回数据本身
+    """
+    
+    if fastjsonschema is not None:
+        return fastjsonschema.compile(schema)
+    
+    def validate(data: Any) -> Any:
+        _check_schema(data, schema, "data")
+        return data
+    
+    return validate
+
+
+# 序列化结果中不含换行、不需要重新缩进的 JSON 类型
+_SCALAR_TYPES = {"string", "integer", "number", "boolean", "null"}
+
+
+def compile_serializer(schema: Dict[str, Any]) -> Callable[[Any], str]:
+    """
+    按工具的输出 schema 生成专用的结果序列化函数（只生成一次，之后每次调用直接使用）
+    
+    生成的函数按 schema 中 properties 的顺序直接拼接 JSON 字节：键名和 const 值
+    在生成时就编码好，只有各个字段的值交给 orjson 编码。输出与 dumps_result
+    相同（缩进 2 格）。结果的键与 schema 不一致或编码失败时退回 dumps_result。
+    
+    Args:
+        schema (Dict[str, Any]): 工具结果的 JSON Schema（type 为 object，带 properties）
+        
+    Returns:
+        Callable[[Any], str]: 序列化函数，返回 JSON 文本
+    """
+    
+    properties = schema.get("properties") or {}
+    if not properties:
+        return dumps_result
+    
+    namespace = {
+        "_dumps": orjson.dumps,
+        "_option": _RESULT_DUMPS_OPTION,
+        "_EncodeError": orjson.JSONEncodeError,
+        "_fallback": dumps_result,
+        "_keys": set(properties),
+    }
+    checks = ["type(r) is dict", "r.keys() == _keys"]
+    parts = []
+    
+    for i, (key, subschema) in enumerate(properties.items()):
+        prefix = (b"{\n  " if i == 0 else b",\n  ") + orjson.dumps(key) + b": "
+        
+        if "const" in subschema and type(subschema["const"]) in (str, int, float, bool):
+            namespace[f"_c{i}"] = subschema["const"]
+            checks.append(f"r[{key!r}] == _c{i}")
+            parts.append(repr(prefix + orjson.dumps(subschema["const"])))
+            continue
+        
+        parts.append(repr(prefix))
+        value = f"_dumps(r[{key!r}], option=_option)"
+        if subschema.get("type") not in _SCALAR_TYPES:
+            # 嵌套的对象 / 数组需要整体再缩进一层
+            value += '.replace(b"\\n", b"\\n  ")'
+        parts.append(value)
+    
+    parts.append(repr(b"\n}"))
+    
+    source = (
+        "def serialize(r):\n"
+        f"    if {' and '.join(checks)}:\n"
+        "        try:\n"
+        f"            return ({' + '.join(parts)}).decode('utf-8')\n"
+        "        except _EncodeError:\n"
+        "            pass\n"
+        "    return _fallback(r)\n"
+    )
+    exec(compile(source, "<mcp-serializer>", "exec"), namespace)
+    return namespace["serialize"]
+
+
+class InvalidParamsError(ValueError):
+    """工具参数不符合其 inputSchema（对应 JSON-RPC 错误码 -32602）"""
+
+
+# JSON-RPC 2.0 请求的外层结构
+_ENVELOPE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "jsonrpc": {"const": "2.0"},
+        "id": {"type": ["string", "integer", "null"]},
+        "method": {"type": "string"},
+        "params": {"type": "object"}
+    },
+    "required": ["jsonrpc", "method"]
+}
+
+_validate_envelope = compile_validator(_ENVELOPE_SCHEMA)
 
 
 class MCPServer:
@@ -103,16 +609,33 @@ class MCPServer:
         # 工具注册表
         self._tools: Dict[str, Dict[str, Any]] = {}
         self._tool_functions: Dict[str, Callable] = {}
+        self._tool_validators: Dict[str, Callable[[Any], Any]] = {}
+        self._tool_serializers: Dict[str, Callable[[Any], str]] = {}
+        self._cheap_tools: set = set()
+        # tools/list 的结果在两次注册之间不变，缓存起来重复使用
+        self._tools_list_cache: Optional[Dict[str, Any]] = None
+        
+        # 本实例专用的工具线程池（每个 MCPServer 各一个），不与默认线程池中的其他任务争抢；
+        # 首次需要时创建，close() 之后再次使用会重新创建（见 _get_executor）
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
         
         # 使用统计
         self._call_stats: Dict[str, int] = {}
-        self._session_id: str = str(uuid.uuid4())
+        self._session_id: str = os.urandom(16).hex()
         self._initialized: bool = False
         
+        # 方法名 -> 处理函数（一次字典查找完成路由）
+        self._method_handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            MethodType.INITIALIZE.value: self._handle_initialize,
+            MethodType.LIST_TOOLS.value: lambda params: self._handle_list_tools(),
+            MethodType.CALL_TOOL.value: self._handle_call_tool,
+        }
+        
         # 注册内置工具
         self._register_builtin_tools()
         
-        logging.info(f"🚀 真正的 MCP Server 初始化完成: {self.name} v{self.version}")
+        logger.info("🚀 真正的 MCP Server 初始化完成: %s v%s", self.name, self.version)
     
     def _register_builtin_tools(self) -> None:
         """注册内置工具"""
@@ -131,7 +654,17 @@ class MCPServer:
                 },
                 "required": ["path"]
             },
-            function=self._read_file_tool
+            function=self._read_file_tool,
+            output_schema={
+                "type": "object",
+                "properties": {
+                    "operation": {"const": "read_file"},
+                    "path": {"type": "string"},
+                    "content": {"type": "string"},
+                    "size": {"type": "integer"},
+                    "timestamp": {"type": "string", "format": "date-time"}
+                }
+            }
         )
         
         # 文件写入工具
@@ -152,7 +685,16 @@ class MCPServer:
                 },
                 "required": ["path", "content"]
             },
-            function=self._write_file_tool
+            function=self._write_file_tool,
+            output_schema={
+                "type": "object",
+                "properties": {
+                    "operation": {"const": "write_file"},
+                    "path": {"type": "string"},
+                    "size": {"type": "integer"},
+                    "timestamp": {"type": "string", "format": "date-time"}
+                }
+            }
         )
         
         # 数学计算工具
@@ -169,7 +711,17 @@ class MCPServer:
                 },
                 "required": ["expression"]
             },
-            function=self._calculate_tool
+            function=self._calculate_tool,
+            output_schema={
+                "type": "object",
+                "properties": {
+                    "operation": {"const": "calculate"},
+                    "expression": {"type": "string"},
+                    "result": {"type": "number"},
+                    "result_type": {"type": "string"},
+                    "timestamp": {"type": "string", "format": "date-time"}
+                }
+            }
         )
         
         # 获取当前时间工具
@@ -186,7 +738,19 @@ class MCPServer:
                     }
                 }
             },
-            function=self._get_time_tool
+            function=self._get_time_tool,
+            is_cheap=True,
+            output_schema={
+                "type": "object",
+                "properties": {
+                    "operation": {"const": "get_current_time"},
+                    "format": {"type": "string"},
+                    "formatted_time": {"type": "string"},
+                    "timestamp": {"type": "number"},
+                    "iso_format": {"type": "string"},
+                    "components": {"type": "object"}
+                }
+            }
         )
     
     def register_tool(
@@ -194,7 +758,9 @@ class MCPServer:
         name: str, 
         description: str, 
         input_schema: Dict[str, Any], 
-        function: Callable
+        function: Callable,
+        output_schema: Optional[Dict[str, Any]] = None,
+        is_cheap: bool = False
     ) -> None:
         """
         注册工具（符合 MCP 标准）
@@ -204,6 +770,10 @@ class MCPServer:
             description (str): 工具描述
             input_schema (Dict[str, Any]): 输入参数的 JSON Schema
             function (Callable): 工具实现函数
+            output_schema (Optional[Dict[str, Any]]): 工具结果的 JSON Schema，
+                提供时为该工具生成专用的结果序列化函数
+            is_cheap (bool): 同步工具耗时极短（亚毫秒）时设为 True，
+                直接在事件循环中调用，省去线程池往返
         """
         
         # 创建符合 MCP 标准的工具定义
@@ -213,15 +783,91 @@ class MCPServer:
             inputSchema=input_schema
         )
         
-        self._tools[name] = asdict(tool)
+        self._tools[name] = tool.to_dict()
         self._tool_functions[name] = function
+        # 参数校验器在注册时编译一次，之后每次调用直接使用
+        self._tool_validators[name] = compile_validator(input_schema)
+        if output_schema is not None:
+            self._tool_serializers[name] = compile_serializer(output_schema)
+        if is_cheap:
+            self._cheap_tools.add(name)
+        self._tools_list_cache = None
         self._call_stats[name] = 0
         
-        logging.info(f"🔧 注册 MCP 工具: {name}")
+        # 注册在启动时批量发生，INFO 关闭时连日志调用一起跳过
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("🔧 注册 MCP 工具: %s", name)
     
-    async def handle_request(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def handle_request(
+        self, request_data: Union[Dict[str, Any], List[Any]]
+    ) -> Union[Dict[str, Any], List[Dict[str, Any]], None]:
         """
-        处理 MCP 请求（符合 JSON-RPC 2.0 标准）
+        处理 MCP 请求（符合 JSON-RPC 2.0 标准，支持批量请求）
+        
+        批量请求中的各个子请求并发处理，响应按请求顺序返回；
+        通知（没有 id 的请求）不出现在响应列表中。
+        
+        Args:
+            request_data (Union[Dict[str, Any], List[Any]]): JSON-RPC 请求数据或请求数组
+            
+        Returns:
+            Union[Dict[str, Any], List[Dict[str, Any]], None]: JSON-RPC 响应数据；
+                批量请求返回响应数组，全部为通知时返回 None
+        """
+        
+        if not isinstance(request_data, list):
+            return await self._handle_single(request_data)
+        
+        if not request_data:
+            return self._create_error_response(None, -32600, "Invalid Request: empty batch")
+        
+        responses = await asyncio.gather(*(self._handle_single(r) for r in request_data))
+        
+        # 格式无效的请求即使没有 id 也要返回错误
+        results = [
+            response for request, response in zip(request_data, responses)
+            if not (isinstance(request, dict) and "id" not in request)
+            or response.get("error", {}).get("code") == -32600
+        ]
+        return results or None
+    
+    async def handle_raw(self, payload: Union[bytes, str]) -> Optional[bytes]:
+        """
+        处理编码后的 JSON-RPC 请求，直接返回编码好的响应字节（供传输层一次写出）
+        
+        单个请求的成功响应不再构建 MCPResponse 和外层字典，
+        只把 result 编码一次后拼上固定的信封字节。
+        
+        Args:
+            payload (Union[bytes, str]): JSON-RPC 请求（单个或批量）的 JSON 文本
+            
+        Returns:
+            Optional[bytes]: JSON-RPC 响应的 JSON 字节；批量请求全部为通知时返回 None
+        """
+        
+        try:
+            request_data = orjson.loads(payload)
+        except orjson.JSONDecodeError as e:
+            return orjson.dumps(self._create_error_response(None, -32700, f"Parse error: {str(e)}"))
+        
+        if isinstance(request_data, list):
+            responses = await self.handle_request(request_data)
+            return None if responses is None else orjson.dumps(responses)
+        
+        request_id, result, error = await self._dispatch(request_data)
+        if error is not None:
+            return orjson.dumps(error)
+        return self._encode_response(request_id, orjson.dumps(result))
+    
+    @staticmethod
+    def _encode_response(request_id: Any, result_bytes: bytes) -> bytes:
+        """把已编码的 result 包装成 JSON-RPC 成功响应"""
+        
+        return b'{"jsonrpc":"2.0","id":' + orjson.dumps(request_id) + b',"result":' + result_bytes + b"}"
+    
+    async def _handle_single(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        处理单个 JSON-RPC 请求
         
         Args:
             request_data (Dict[str, Any]): JSON-RPC 请求数据
@@ -230,39 +876,60 @@ class MCPServer:
             Dict[str, Any]: JSON-RPC 响应数据
         """
         
-        try:
-            # 解析请求
-            request = MCPRequest(**request_data)
+        request_id, result, error = await self._dispatch(request_data)
+        if error is not None:
+            return error
+        
+        # 创建成功响应
+        response = MCPResponse(
+            id=request_id,
+            result=result
+        )
+        
+        return response.to_dict()
+    
+    async def _dispatch(self, request_data: Dict[str, Any]) -> Tuple[Any, Any, Optional[Dict[str, Any]]]:
+        """
+        校验并执行单个 JSON-RPC 请求
+        
+        Args:
+            request_data (Dict[str, Any]): JSON-RPC 请求数据
             
-            # 验证 JSON-RPC 格式
-            if request.jsonrpc != "2.0":
-                return self._create_error_response(
-                    request.id, -32600, "Invalid Request"
+        Returns:
+            Tuple[Any, Any, Optional[Dict[str, Any]]]: (请求 id, 执行结果, 错误响应)；
+                成功时错误响应为 None
+        """
+        
+        try:
+            # 验证 JSON-RPC 格式（校验器在模块加载时编译好）
+            try:
+                _validate_envelope(request_data)
+            except ValueError as e:
+                request_id = request_data.get("id") if isinstance(request_data, dict) else None
+                return request_id, None, self._create_error_response(
+                    request_id, -32600, f"Invalid Request: {str(e)}"
                 )
             
+            request_id = request_data.get("id")
+            method = request_data["method"]
+            params = request_data.get("params") or {}
+            
             # 路由到对应的处理方法
-            if request.method == MethodType.INITIALIZE.value:
-                result = await self._handle_initialize(request.params or {})
-            elif request.method == MethodType.LIST_TOOLS.value:
-                result = await self._handle_list_tools()
-            elif request.method == MethodType.CALL_TOOL.value:
-                result = await self._handle_call_tool(request.params or {})
-            else:
-                return self._create_error_response(
-                    request.id, -32601, f"Method not found: {request.method}"
+            handler = self._method_handlers.get(method)
+            if handler is None:
+                return request_id, None, self._create_error_response(
+                    request_id, -32601, f"Method not found: {method}"
                 )
             
-            # 创建成功响应
-            response = MCPResponse(
-                id=request.id,
-                result=result
-            )
-            
-            return asdict(response)
+            return request_id, await handler(params), None
             
+        except InvalidParamsError as e:
+            return request_data.get("id"), None, self._create_error_response(
+                request_data.get("id"), -32602, f"Invalid params: {str(e)}"
+            )
         except Exception as e:
-            logging.error(f"处理 MCP 请求时发生错误: {str(e)}")
-            return self._create_error_response(
+            logger.error("处理 MCP 请求时发生错误: %s", e)
+            return request_data.get("id"), None, self._create_error_response(
                 request_data.get("id"), -32603, f"Internal error: {str(e)}"
             )
     
@@ -286,9 +953,10 @@ class MCPServer:
         if not self._initialized:
             raise Exception("Server not initialized")
         
-        tools = list(self._tools.values())
+        if self._tools_list_cache is None:
+            self._tools_list_cache = {"tools": list(self._tools.values())}
         
-        return {"tools": tools}
+        return self._tools_list_cache
     
     async def _handle_call_tool(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """处理工具调用请求"""
@@ -302,24 +970,30 @@ class MCPServer:
         if tool_name not in self._tool_functions:
             raise Exception(f"Tool not found: {tool_name}")
         
+        self._validate_arguments(tool_name, arguments)
+        
         try:
             # 更新调用统计
             self._call_stats[tool_name] += 1
             
             # 执行工具函数
             function = self._tool_functions[tool_name]
-            result = await self._execute_tool_safely(function, arguments)
+            result = await self._execute_tool_safely(
+                function, arguments, tool_name in self._cheap_tools
+            )
             
             # 返回符合 MCP 标准的结果
-            tool_result = ToolResult(
-                content=[{
+            if isinstance(result, dict) and isinstance(result.get("content"), ChunkedText):
+                content = self._chunked_content(result)
+            else:
+                content = [{
                     "type": "text",
-                    "text": json.dumps(result, ensure_ascii=False, indent=2)
-                }],
-                isError=False
-            )
+                    "text": self._tool_serializers.get(tool_name, dumps_result)(result)
+                }]
             
-            return asdict(tool_result)
+            tool_result = ToolResult(content=content, isError=False)
+            
+            return tool_result.to_dict()
             
         except Exception as e:
             # 返回错误结果
@@ -331,18 +1005,110 @@ class MCPServer:
                 isError=True
             )
             
-            return asdict(tool_result)
+            return tool_result.to_dict()
     
-    async def _execute_tool_safely(self, function: Callable, arguments: Dict[str, Any]) -> Any:
+    def _chunked_content(self, result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        把含有分块文本的结果拆成多个 MCP 文本内容块
+        
+        第一块是去掉 content 后的结果信息（附带块数），之后每个文本块原样返回，
+        不经过 JSON 编码。
+        """
+        
+        chunks = result["content"]
+        meta = {key: value for key, value in result.items() if key != "content"}
+        meta["chunks"] = len(chunks)
+        
+        content = [{"type": "text", "text": dumps_result(meta)}]
+        content.extend({"type": "text", "text": chunk} for chunk in chunks)
+        return content
+    
+    async def execute_tool_fast(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """
+        进程内直接执行工具（供同一进程中的 MCP 客户端使用）
+        
+        与 tools/call 请求执行相同的检查和统计，但直接返回工具函数的结果，
+        不构建 JSON-RPC 响应，也不把结果编码成文本内容。
+        分块读取的文件内容会拼接成一个字符串，与 tools/call 的客户端看到的结果一致。
+        
+        Args:
+            tool_name (str): 工具名称
+            arguments (Dict[str, Any]): 工具参数
+            
+        Returns:
+            Any: 工具函数的返回值
+            
+        Raises:
+            Exception: 服务器未初始化、工具不存在或工具执行失败
+        """
+        
+        if not self._initialized:
+            raise Exception("Server not initialized")
+        
+        if tool_name not in self._tool_functions:
+            raise Exception(f"Tool not found: {tool_name}")
+        
+        self._validate_arguments(tool_name, arguments)
+        self._call_stats[tool_name] += 1
+        
+        result = await self._execute_tool_safely(
+            self._tool_functions[tool_name], arguments, tool_name in self._cheap_tools
+        )
+        if isinstance(result, dict) and isinstance(result.get("content"), ChunkedText):
+            result["content"] = "".join(result["content"])
+        return result
+    
+    def _validate_arguments(self, tool_name: str, arguments: Any) -> None:
+        """按工具的 inputSchema 校验参数，不通过时抛出 InvalidParamsError"""
+        
+        try:
+            self._tool_validators[tool_name](arguments)
+        except ValueError as e:
+            raise InvalidParamsError(str(e)) from e
+    
+    async def _execute_tool_safely(
+        self, function: Callable, arguments: Dict[str, Any], is_cheap: bool = False
+    ) -> Any:
         """安全执行工具函数"""
         
-        # 如果是异步函数
-        if asyncio.iscoroutinefunction(function):
-            return await function(**arguments)
-        else:
-            # 在线程池中执行同步函数
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, lambda: function(**arguments))
+        token = _current_request_time.set(_now())
+        try:
+            # 如果是异步函数
+            if asyncio.iscoroutinefunction(function):
+                return await function(**arguments)
+            elif is_cheap:
+                # 耗时极短的同步函数直接调用
+                return function(**arguments)
+            else:
+                # 在工具线程池中执行同步函数（在复制的上下文中运行，工具能读到调用开始时间）
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._get_executor(),
+                    functools.partial(contextvars.copy_context().run, function, **arguments)
+                )
+        finally:
+            _current_request_time.reset(token)
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """返回工具线程池，尚未创建或已关闭时新建一个"""
+        
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=TOOL_THREADS, thread_name_prefix="mcp-tool"
+                )
+            return self._executor
+    
+    def close(self) -> None:
+        """
+        关闭工具线程池（等待正在执行的工具完成）
+        
+        可以重复调用；之后如果还有工具调用，会自动创建新的线程池。
+        """
+        
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
     
     def _create_error_response(self, request_id: Any, code: int, message: str) -> Dict[str, Any]:
         """创建错误响应"""
@@ -350,37 +1116,43 @@ class MCPServer:
         error = MCPError(code=code, message=message)
         response = MCPResponse(id=request_id, error=error)
         
-        return asdict(response)
+        return response.to_dict()
     
     # ===========================================
     # 工具实现函数
     # ===========================================
     
-    def _read_file_tool(self, path: str) -> Dict[str, Any]:
-        """文件读取工具实现"""
+    async def _read_file_tool(self, path: str) -> Dict[str, Any]:
+        """文件读取工具实现（小文件直接读取，大文件在线程池中分块读取）"""
         
         try:
-            # 安全检查
-            if not os.path.exists(path):
+            try:
+                size = os.stat(path).st_size
+            except FileNotFoundError:
                 raise FileNotFoundError(f"文件不存在: {path}")
             
             # 读取文件
-            with open(path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            if 0 < size <= INLINE_IO_BYTES:
+                content = read_text(path)
+                length = len(content)
+            else:
+                chunks = await asyncio.get_running_loop().run_in_executor(self._get_executor(), read_text_chunks, path)
+                length = sum(map(len, chunks))
+                content = ChunkedText(chunks) if len(chunks) > 1 else "".join(chunks)
             
             return {
                 "operation": "read_file",
                 "path": path,
                 "content": content,
-                "size": len(content),
-                "timestamp": datetime.datetime.now().isoformat()
+                "size": length,
+                "timestamp": request_time().isoformat()
             }
             
         except Exception as e:
             raise Exception(f"读取文件失败: {str(e)}")
     
-    def _write_file_tool(self, path: str, content: str) -> Dict[str, Any]:
-        """文件写入工具实现"""
+    async def _write_file_tool(self, path: str, content: str) -> Dict[str, Any]:
+        """文件写入工具实现（小内容直接写入，大内容交给线程池）"""
         
         try:
             # 确保目录存在
@@ -389,14 +1161,16 @@ class MCPServer:
                 os.makedirs(directory, exist_ok=True)
             
             # 写入文件
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            if len(content) <= INLINE_IO_BYTES:
+                write_text(path, content)
+            else:
+                await asyncio.get_running_loop().run_in_executor(self._get_executor(), write_text, path, content)
             
             return {
                 "operation": "write_file",
                 "path": path,
                 "size": len(content),
-                "timestamp": datetime.datetime.now().isoformat()
+                "timestamp": request_time().isoformat()
             }
             
         except Exception as e:
@@ -406,20 +1180,19 @@ class MCPServer:
         """数学计算工具实现"""
         
         try:
-            # 安全检查
-            allowed_chars = set('0123456789+-*/().%** ')
-            if not all(c in allowed_chars for c in expression):
+            # 安全检查：一次 C 层的 translate 先排除其他字符，避免解析任意输入
+            if expression.translate(_CALC_STRIP_ALLOWED):
                 raise ValueError("表达式包含不允许的字符")
             
             # 计算结果
-            result = eval(expression, {"__builtins__": {}}, {})
+            result = evaluate_expression(expression)
             
             return {
                 "operation": "calculate",
                 "expression": expression,
                 "result": result,
                 "result_type": type(result).__name__,
-                "timestamp": datetime.datetime.now().isoformat()
+                "timestamp": request_time().isoformat()
             }
             
         except Exception as e:
@@ -428,33 +1201,14 @@ class MCPServer:
     def _get_time_tool(self, format: str = "iso") -> Dict[str, Any]:
         """获取时间工具实现"""
         
-        now = datetime.datetime.now()
-        
-        if format == "iso":
-            formatted_time = now.isoformat()
-        elif format == "timestamp":
-            formatted_time = str(now.timestamp())
-        else:
-            formatted_time = now.strftime(format)
-        
-        return {
-            "operation": "get_current_time",
-            "format": format,
-            "formatted_time": formatted_time,
-            "timestamp": now.timestamp(),
-            "iso_format": now.isoformat(),
-            "components": {
-                "year": now.year,
-                "month": now.month,
-                "day": now.day,
-                "hour": now.hour,
-                "minute": now.minute,
-                "second": now.second
-            }
-        }
+        return _format_time(format, request_time())
     
     def get_server_stats(self) -> Dict[str, Any]:
-        """获取服务器统计信息"""
+        """
+        获取服务器统计信息
+        
+        返回的是快照：各部分都是新字典，调用方修改它不会影响服务器状态。
+        """
         
         return {
             "server_info": {
@@ -467,8 +1221,8 @@ class MCPServer:
                 "total": len(self._tools),
                 "names": list(self._tools.keys())
             },
-            "call_stats": self._call_stats.copy(),
-            "capabilities": self.capabilities
+            "call_stats": dict(self._call_stats),
+            "capabilities": {name: dict(value) for name, value in self.capabilities.items()}
         }
 
 
@@ -0,0 +1,547 @@
+"""
+MCP Server 行为测试
+覆盖计算器求值、JSON-RPC 协议细节等对外可见的行为。
+
+运行方式：
+    python test_mcp_server.py      # 逐项打印 ✅ / ❌
+    python -m pytest test_mcp_server.py
+"""
+import types
+import asyncio
+
+import src.mcp_server as mcp_server_module
+from src.mcp_server import MCPServer
+
+
+def _run(coro):
+    """在新的事件循环中运行协程（测试函数保持同步，pytest 无需异步插件）"""
+    return asyncio.run(coro)
+
+
+def _initialized_server():
+    """创建并初始化一个 MCP Server"""
+    server = MCPServer()
+    _run(server.handle_request({"jsonrpc": "2.0", "id": 0, "method": "initialize", "params": {}}))
+    return server
+
+
+# ===========================================
+# 计算器
+# ===========================================
+
+_OVERFLOW_EXPRESSION = "10.0 ** 400"
+
+
+def _python_result(expression):
+    """只用 Python 求值，返回 (结果, 异常类型)"""
+    kernel = mcp_server_module._run_program_f64
+    mcp_server_module._run_program_f64 = None
+    try:
+        return mcp_server_module.evaluate_expression(expression), None
+    except Exception as e:
+        return None, type(e)
+    finally:
+        mcp_server_module._run_program_f64 = kernel
+
+
+def _float64_kernel(ops, consts):
+    """按 float64 语义模拟 JIT 求值核：所有中间结果都是 float，溢出得到 inf 而不是异常"""
+    try:
+        return mcp_server_module._run_program(tuple(ops), tuple(float(c) for c in consts))
+    except OverflowError:
+        return float("inf")
+
+
+def _kernel_result(expression):
+    """经过浮点求值核求值，返回 (结果, 异常类型)
+
+    未安装 numba 时用 _float64_kernel 代替求值核，验证选用求值核的条件和回退逻辑。
+    """
+    saved = mcp_server_module._run_program_f64, getattr(mcp_server_module, "np", None)
+    if mcp_server_module._run_program_f64 is None:
+        mcp_server_module._run_program_f64 = _float64_kernel
+        mcp_server_module.np = types.SimpleNamespace(
+            array=lambda values, dtype=None: list(values), int8=None, float64=None
+        )
+    try:
+        return mcp_server_module.evaluate_expression(expression), None
+    except Exception as e:
+        return None, type(e)
+    finally:
+        mcp_server_module._run_program_f64, np = saved
+        if np is None:
+            del mcp_server_module.np
+        else:
+            mcp_server_module.np = np
+
+
+def test_overflow_matches_between_kernel_and_python():
+    """求值核溢出时结果与 Python 求值一致（都抛出 OverflowError，而不是返回 inf）"""
+    python = _python_result(_OVERFLOW_EXPRESSION)
+    kernel = _kernel_result(_OVERFLOW_EXPRESSION)
+    assert python == (None, OverflowError)
+    assert kernel == python
+
+
+def test_finite_float_matches_between_kernel_and_python():
+    """正常的浮点表达式两条路径结果相同"""
+    for expression in ("1.5 * 4 / 3", "0.1 + 0.2", "-2.5 % 1.5", "7.5 // 2.0", "2.0 ** 0.5"):
+        assert _kernel_result(expression) == _python_result(expression), expression
+
+
+def test_large_integer_intermediates_match_python():
+    """整数中间结果超出 float64 精度时，安装 numba 与否结果相同"""
+    cases = {
+        "(10**17 + 1 - 10**17) / 1": 1.0,
+        "(2**60 + 1) % 10 / 1": 7.0,
+        "(2**53 + 1) * 1.0": float(2**53 + 1),
+    }
+    for expression, expected in cases.items():
+        assert _python_result(expression) == (expected, None), expression
+        assert _kernel_result(expression) == (expected, None), expression
+
+
+def test_floor_division():
+    """支持整除 //：整数保持整数，浮点数按 Python 语义向下取整"""
+    cases = {"7 // 2": 3, "-7 // 2": -4, "7.5 // 2.0": 3.0, "-7.5 // 2.0": -4.0, "2**70 // 3": 2**70 // 3}
+    for expression, expected in cases.items():
+        for result in (_python_result(expression), _kernel_result(expression)):
+            assert result == (expected, None), expression
+            assert type(result[0]) is type(expected), expression
+    assert _python_result("1 // 0") == (None, ZeroDivisionError)
+
+
+
+# ===========================================
+# JSON-RPC 外层结构校验
+# ===========================================
+
+# (请求, 是否符合 JSON-RPC 2.0 外层结构)
+_ENVELOPE_CASES = [
+    ({"jsonrpc": "2.0", "id": 1, "method": "tools/list"}, True),
+    ({"jsonrpc": "2.0", "id": "a", "method": "tools/list", "params": {}}, True),
+    ({"jsonrpc": "2.0", "id": None, "method": "tools/list"}, True),
+    ({"jsonrpc": "2.0", "method": "tools/list"}, True),
+    ({"jsonrpc": "1.0", "id": 1, "method": "tools/list"}, False),
+    ({"id": 1, "method": "tools/list"}, False),
+    ({"jsonrpc": "2.0", "id": 1}, False),
+    ({"jsonrpc": "2.0", "id": 1, "method": 5}, False),
+    ({"jsonrpc": "2.0", "id": 1.5, "method": "tools/list"}, False),
+    ({"jsonrpc": "2.0", "id": True, "method": "tools/list"}, False),
+    ({"jsonrpc": "2.0", "id": 1, "method": "tools/list", "params": []}, False),
+    ([], False),
+    ("request", False),
+]
+
+
+def _accepts(validator, data):
+    try:
+        validator(data)
+        return True
+    except ValueError:
+        return False
+
+
+def test_envelope_fallback_validator_verdicts():
+    """未安装 fastjsonschema 时使用的解释型校验器给出与 JSON Schema 一致的结论"""
+    saved = mcp_server_module.fastjsonschema
+    mcp_server_module.fastjsonschema = None
+    try:
+        validator = mcp_server_module.compile_validator(mcp_server_module._ENVELOPE_SCHEMA)
+    finally:
+        mcp_server_module.fastjsonschema = saved
+    
+    for data, expected in _ENVELOPE_CASES:
+        assert _accepts(validator, data) == expected, data
+
+
+def test_envelope_fastjsonschema_matches_fallback():
+    """安装了 fastjsonschema 时，它与解释型校验器对每个用例的结论相同"""
+    if mcp_server_module.fastjsonschema is None:
+        return
+    validator = mcp_server_module.fastjsonschema.compile(mcp_server_module._ENVELOPE_SCHEMA)
+    for data, expected in _ENVELOPE_CASES:
+        assert _accepts(validator, data) == expected, data
+
+
+def test_invalid_envelope_returns_32600():
+    """外层结构不合法的请求返回 -32600，并尽量带回请求 id"""
+    server = _initialized_server()
+    
+    response = _run(server.handle_request({"jsonrpc": "1.0", "id": 7, "method": "tools/list"}))
+    assert response["id"] == 7
+    assert response["error"]["code"] == -32600
+    assert response["error"]["message"].startswith("Invalid Request:")
+    assert "result" not in response
+    
+    response = _run(server.handle_request("not a request"))
+    assert response["id"] is None
+    assert response["error"]["code"] == -32600
+
+
+
+# ===========================================
+# 工具参数校验
+# ===========================================
+
+def _call(server, name, arguments, request_id=1):
+    return _run(server.handle_request({
+        "jsonrpc": "2.0", "id": request_id, "method": "tools/call",
+        "params": {"name": name, "arguments": arguments}
+    }))
+
+
+def test_invalid_arguments_return_32602():
+    """参数不符合 inputSchema 时返回 -32602，工具不会被执行"""
+    server = _initialized_server()
+    
+    for arguments in ({}, {"expression": 5}, {"expression": None}):
+        response = _call(server, "calculate", arguments)
+        assert response["error"]["code"] == -32602, arguments
+        assert response["error"]["message"].startswith("Invalid params:")
+        assert "result" not in response
+    
+    assert server.get_server_stats()["call_stats"]["calculate"] == 0
+
+
+def test_valid_arguments_still_execute():
+    """符合 inputSchema 的参数正常执行"""
+    server = _initialized_server()
+    response = _call(server, "calculate", {"expression": "1 + 2"})
+    assert response["result"]["isError"] is False
+    assert server.get_server_stats()["call_stats"]["calculate"] == 1
+
+
+def test_execute_tool_fast_validates_arguments():
+    """进程内调用同样按 inputSchema 校验参数"""
+    server = _initialized_server()
+    try:
+        _run(server.execute_tool_fast("write_file", {"path": "x.txt"}))
+    except mcp_server_module.InvalidParamsError:
+        pass
+    else:
+        raise AssertionError("缺少 content 参数时应抛出 InvalidParamsError")
+
+
+
+# ===========================================
+# 时间工具
+# ===========================================
+
+def test_time_tool_keeps_microseconds():
+    """时间工具返回调用开始时间的完整精度（不按毫秒截断）"""
+    import datetime
+    server = _initialized_server()
+    now = datetime.datetime(2024, 1, 2, 3, 4, 5, 123456)
+    token = mcp_server_module._current_request_time.set(now)
+    try:
+        result = server._get_time_tool("iso")
+    finally:
+        mcp_server_module._current_request_time.reset(token)
+    assert result["formatted_time"] == "2024-01-02T03:04:05.123456"
+    assert result["iso_format"] == now.isoformat()
+    assert result["timestamp"] == now.timestamp()
+
+
+def test_executor_tools_see_request_time():
+    """线程池中执行的同步工具读到的是调用开始时间，而不是重新取的当前时间"""
+    import datetime
+    import itertools
+    server = _initialized_server()
+    server.register_tool(
+        "echo_time", "返回 request_time()", {"type": "object", "properties": {}},
+        lambda: mcp_server_module.request_time()
+    )
+    
+    start = datetime.datetime(2024, 1, 1)
+    ticks = itertools.count()
+    saved = mcp_server_module._now
+    mcp_server_module._now = lambda: start + datetime.timedelta(seconds=next(ticks))
+    try:
+        result = _run(server.execute_tool_fast("echo_time", {}))
+    finally:
+        mcp_server_module._now = saved
+    assert result == start
+
+
+
+# ===========================================
+# 批量请求与通知
+# ===========================================
+
+def test_batch_preserves_order_and_omits_notifications():
+    """批量请求的响应按请求顺序返回，通知不产生响应"""
+    server = _initialized_server()
+    batch = [
+        {"jsonrpc": "2.0", "id": "a", "method": "tools/call",
+         "params": {"name": "calculate", "arguments": {"expression": "2 * 3"}}},
+        {"jsonrpc": "2.0", "method": "tools/list"},
+        {"jsonrpc": "2.0", "id": "b", "method": "tools/list"},
+        {"jsonrpc": "2.0", "id": "c", "method": "no/such/method"},
+    ]
+    responses = _run(server.handle_request(batch))
+    
+    assert [r["id"] for r in responses] == ["a", "b", "c"]
+    assert responses[0]["result"]["isError"] is False
+    assert "tools" in responses[1]["result"]
+    assert responses[2]["error"]["code"] == -32601
+
+
+def test_batch_invalid_entries_still_answered():
+    """批量中格式无效的条目即使没有 id 也返回 -32600"""
+    server = _initialized_server()
+    responses = _run(server.handle_request([
+        {"jsonrpc": "1.0", "method": "tools/list"},
+        5,
+        {"jsonrpc": "2.0", "id": 1, "method": "tools/list"},
+    ]))
+    
+    assert [r.get("error", {}).get("code") for r in responses] == [-32600, -32600, None]
+    assert responses[0]["id"] is None and responses[1]["id"] is None
+    assert responses[2]["id"] == 1
+
+
+def test_empty_batch_returns_32600():
+    """空数组是无效请求，返回单个 -32600 错误而不是数组"""
+    server = _initialized_server()
+    response = _run(server.handle_request([]))
+    assert isinstance(response, dict)
+    assert response["id"] is None
+    assert response["error"]["code"] == -32600
+
+
+def test_batch_of_notifications_returns_none():
+    """全部为通知的批量请求没有任何响应"""
+    server = _initialized_server()
+    response = _run(server.handle_request([
+        {"jsonrpc": "2.0", "method": "tools/list"},
+        {"jsonrpc": "2.0", "method": "tools/call",
+         "params": {"name": "calculate", "arguments": {"expression": "1 + 1"}}},
+    ]))
+    assert response is None
+    # 通知仍然会被执行
+    assert server.get_server_stats()["call_stats"]["calculate"] == 1
+
+
+
+# ===========================================
+# 工具结果序列化
+# ===========================================
+
+def test_inprocess_results_are_json_serializable():
+    """进程内调用返回的结果字典只含 JSON 类型（时间戳为 ISO 8601 字符串）"""
+    import json
+    import datetime
+    server = _initialized_server()
+    result = _run(server.execute_tool_fast("calculate", {"expression": "6 * 7"}))
+    
+    assert isinstance(result["timestamp"], str)
+    datetime.datetime.fromisoformat(result["timestamp"])
+    json.dumps(result, ensure_ascii=False)
+
+
+def _assert_serializer_matches(server, name, result):
+    expected = mcp_server_module.dumps_result(result)
+    assert server._tool_serializers[name](result) == expected, name
+
+
+def test_generated_serializers_match_dumps_result():
+    """按输出 schema 生成的序列化函数与 dumps_result 逐字节一致"""
+    import os
+    import tempfile
+    server = _initialized_server()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "数据.txt")
+        calls = [
+            ("write_file", {"path": path, "content": "你好，\n世界 \"quoted\"\n"}),
+            ("read_file", {"path": path}),
+            ("calculate", {"expression": "1.5 * 4 / 7"}),
+            ("calculate", {"expression": "(2 + 3) * 4"}),
+            ("get_current_time", {"format": "iso"}),
+            ("get_current_time", {"format": "%Y年%m月%d日"}),
+        ]
+        for name, arguments in calls:
+            result = _run(server.execute_tool_fast(name, arguments))
+            _assert_serializer_matches(server, name, result)
+
+
+def test_generated_serializer_falls_back():
+    """结果的键与 schema 不一致、或 orjson 无法编码时退回 dumps_result"""
+    server = _initialized_server()
+    
+    # 超出 64 位的整数：orjson 编码失败，退回标准库 json
+    result = _run(server.execute_tool_fast("calculate", {"expression": "2 ** 100"}))
+    assert result["result"] == 2 ** 100
+    _assert_serializer_matches(server, "calculate", result)
+    
+    # 多出 / 缺少字段
+    extra = dict(result, result=1, note="额外字段")
+    _assert_serializer_matches(server, "calculate", extra)
+    missing = {"operation": "calculate", "expression": "1"}
+    _assert_serializer_matches(server, "calculate", missing)
+
+
+
+# ===========================================
+# 大文件分块读取
+# ===========================================
+
+def test_chunked_read_returns_full_content():
+    """超过 READ_CHUNK_BYTES 的文件经 JSON-RPC 和进程内两条路径都读到完整内容"""
+    import os
+    import tempfile
+    from src.mcp_client import MCPClient
+    
+    text = "分块读取测试：中文 + ASCII mixed 内容。\n" * 20
+    saved = mcp_server_module.READ_CHUNK_BYTES, mcp_server_module.INLINE_IO_BYTES
+    mcp_server_module.READ_CHUNK_BYTES, mcp_server_module.INLINE_IO_BYTES = 64, 16
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "big.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            
+            server = _initialized_server()
+            response = _call(server, "read_file", {"path": path})
+            assert len(response["result"]["content"]) > 2  # 确实按块返回
+            
+            for inprocess in (False, True):
+                client = MCPClient(server=server)
+                client._inprocess = inprocess
+                assert _run(client.initialize())
+                outcome = _run(client.call_tool("read_file", {"path": path}))
+                assert outcome["success"], outcome
+                assert outcome["result"]["content"] == text, inprocess
+                assert outcome["result"]["size"] == len(text)
+                assert "chunks" not in outcome["result"]
+    finally:
+        mcp_server_module.READ_CHUNK_BYTES, mcp_server_module.INLINE_IO_BYTES = saved
+
+
+
+# ===========================================
+# 编码后的请求（handle_raw）
+# ===========================================
+
+def _raw(server, payload):
+    import orjson
+    response = _run(server.handle_raw(payload))
+    return None if response is None else orjson.loads(response)
+
+
+def test_handle_raw_matches_handle_request():
+    """handle_raw 的响应解码后与 handle_request 的响应相同（bytes 和 str 请求都支持）"""
+    import orjson
+    server = _initialized_server()
+    request = {"jsonrpc": "2.0", "id": "x", "method": "tools/list"}
+    expected = _run(server.handle_request(request))
+    
+    assert _run(server.handle_raw(orjson.dumps(request))).startswith(b'{"jsonrpc":"2.0","id":"x",')
+    assert _raw(server, orjson.dumps(request)) == expected
+    assert _raw(server, orjson.dumps(request).decode("utf-8")) == expected
+    
+    response = _raw(server, b'{"jsonrpc": "2.0", "id": 3, "method": "tools/call",'
+                             b' "params": {"name": "calculate", "arguments": {"expression": "6 * 7"}}}')
+    assert response["id"] == 3 and response["result"]["isError"] is False
+    assert '"result": 42' in response["result"]["content"][0]["text"]
+
+
+def test_handle_raw_parse_error_returns_32700():
+    """无法解析的 JSON 返回 -32700，id 为 null"""
+    server = _initialized_server()
+    for payload in (b'{"jsonrpc": "2.0", "id": 1, "method"', b"", "不是 JSON"):
+        response = _raw(server, payload)
+        assert response["id"] is None, payload
+        assert response["error"]["code"] == -32700
+        assert response["error"]["message"].startswith("Parse error:")
+
+
+def test_handle_raw_errors_and_batches():
+    """handle_raw 对参数错误、无效请求和批量请求的处理与 handle_request 一致"""
+    import orjson
+    server = _initialized_server()
+    
+    response = _raw(server, b'{"jsonrpc": "2.0", "id": 9, "method": "tools/call",'
+                             b' "params": {"name": "calculate", "arguments": {}}}')
+    assert response["id"] == 9
+    assert response["error"]["code"] == -32602
+    
+    response = _raw(server, b'{"jsonrpc": "1.0", "id": 4, "method": "tools/list"}')
+    assert response["error"]["code"] == -32600
+    
+    batch = [
+        {"jsonrpc": "2.0", "id": 1, "method": "tools/list"},
+        {"jsonrpc": "2.0", "method": "tools/list"},
+        {"jsonrpc": "2.0", "id": 2, "method": "no/such/method"},
+    ]
+    responses = _raw(server, orjson.dumps(batch))
+    assert responses == _run(server.handle_request(batch))
+    assert [r["id"] for r in responses] == [1, 2]
+    
+    assert _run(server.handle_raw(b'[{"jsonrpc": "2.0", "method": "tools/list"}]')) is None
+    assert _raw(server, b"[]")["error"]["code"] == -32600
+
+
+
+# ===========================================
+# 工具线程池
+# ===========================================
+
+def test_close_is_idempotent_and_recreates_executor():
+    """close() 可以重复调用，之后线程池中的工具仍能执行（自动创建新的线程池）"""
+    server = _initialized_server()
+    server.close()  # 尚未创建线程池
+    
+    for _ in range(2):
+        result = _run(server.execute_tool_fast("calculate", {"expression": "3 * 3"}))
+        assert result["result"] == 9
+        server.close()
+        server.close()
+    
+    # 同一个 asyncio.run 中关闭后立即再次使用
+    async def close_and_call():
+        await server.execute_tool_fast("calculate", {"expression": "1 + 1"})
+        server.close()
+        return await server.execute_tool_fast("calculate", {"expression": "2 + 2"})
+    
+    assert _run(close_and_call())["result"] == 4
+    server.close()
+
+
+
+# ===========================================
+# 服务器统计
+# ===========================================
+
+def test_server_stats_is_a_snapshot():
+    """get_server_stats 返回快照：之后的调用不改变它，修改它也不影响服务器"""
+    import json
+    server = _initialized_server()
+    stats = server.get_server_stats()
+    json.dumps(stats)
+    
+    _call(server, "calculate", {"expression": "1 + 1"})
+    assert stats["call_stats"]["calculate"] == 0
+    assert stats["server_info"]["initialized"] is True
+    
+    stats["call_stats"]["calculate"] = 99
+    stats["server_info"]["initialized"] = False
+    stats["capabilities"]["tools"]["listChanged"] = False
+    fresh = server.get_server_stats()
+    assert fresh["call_stats"]["calculate"] == 1
+    assert fresh["server_info"]["initialized"] is True
+    assert fresh["capabilities"]["tools"]["listChanged"] is True
+
+
+if __name__ == "__main__":
+    failed = 0
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            try:
+                func()
+                print(f"✅ {name}")
+            except Exception as e:
+                failed += 1
+                print(f"❌ {name}: {type(e).__name__}: {e}")
+    print(f"\n{'全部通过' if not failed else f'{failed} 项失败'}")